@@ -3,7 +3,6 @@ import aiohttp
 import logging
 import os
 import mimetypes
-import tempfile
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Union
 from config import (
@@ -44,6 +43,24 @@ class FileValidationError(Exception):
     pass
 
 
+def _validate_size_and_type(file_size: int, filename: str) -> None:
+    """Check audio size limits and file extension."""
+    if file_size == 0:
+        raise FileValidationError("File content is empty")
+
+    if file_size > MAX_FILE_SIZE:
+        size_mb = file_size / (1024 * 1024)
+        raise FileValidationError(f"File too large: {size_mb:.1f}MB (max: {MAX_FILE_SIZE // (1024 * 1024)}MB)")
+
+    # Check file extension
+    file_extension = Path(filename).suffix.lower()
+    if file_extension not in SUPPORTED_AUDIO_TYPES:
+        raise FileValidationError(
+            f"Unsupported file type: {file_extension}. Supported: {', '.join(SUPPORTED_AUDIO_TYPES)}")
+
+    logger.info(f"File validation passed: {filename} ({file_size / 1024:.1f}KB)")
+
+
 def validate_file_content(file_content: bytes, filename: str) -> None:
     """
     Validate audio file content for transcription.
@@ -59,19 +76,26 @@ def validate_file_content(file_content: bytes, filename: str) -> None:
     if not file_content:
         raise FileValidationError("File content is empty")
 
-    # Check file size
-    file_size = len(file_content)
-    if file_size > MAX_FILE_SIZE:
-        size_mb = file_size / (1024 * 1024)
-        raise FileValidationError(f"File too large: {size_mb:.1f}MB (max: {MAX_FILE_SIZE // (1024 * 1024)}MB)")
+    _validate_size_and_type(len(file_content), filename)
 
-    # Check file extension
-    file_extension = Path(filename).suffix.lower()
-    if file_extension not in SUPPORTED_AUDIO_TYPES:
-        raise FileValidationError(
-            f"Unsupported file type: {file_extension}. Supported: {', '.join(SUPPORTED_AUDIO_TYPES)}")
 
-    logger.info(f"File validation passed: {filename} ({file_size / 1024:.1f}KB)")
+def validate_file_path(file_path: Union[str, Path], filename: str) -> None:
+    """
+    Validate audio file stored on disk for transcription.
+
+    Args:
+        file_path: Path to the audio file
+        filename: Original filename
+
+    Raises:
+        FileValidationError: If file is invalid
+    """
+    try:
+        file_size = os.path.getsize(file_path)
+    except OSError:
+        raise FileValidationError(f"File not found: {file_path}")
+
+    _validate_size_and_type(file_size, filename)
 
 
 def validate_parameters(
@@ -119,8 +143,8 @@ def validate_parameters(
 
 
 async def transcribe_audio(
-        file_content: bytes,
-        filename: str,
+        file_content: Optional[bytes] = None,
+        filename: Optional[str] = None,
         language: str = DEFAULT_LANGUAGE,
         prompt: Optional[str] = None,
         speaker_labels: bool = DEFAULT_SPEAKER_LABELS,
@@ -129,14 +153,15 @@ async def transcribe_audio(
         timestamp_granularities: List[str] = None,
         callback_url: Optional[str] = None,
         min_speakers: Optional[int] = DEFAULT_MIN_SPEAKERS,
-        max_speakers: Optional[int] = DEFAULT_MAX_SPEAKERS
+        max_speakers: Optional[int] = DEFAULT_MAX_SPEAKERS,
+        file_path: Optional[Union[str, Path]] = None
 ) -> Dict[str, Any]:
     """
     Transcribe audio file using Whisper API (async version).
 
     Args:
-        file_content: Audio file content as bytes
-        filename: Original filename
+        file_content: Audio file content as bytes (ignored if file_path is given)
+        filename: Original filename (defaults to the name of file_path)
         language: Language for transcription
         prompt: Optional prompt for context
         speaker_labels: Whether to include speaker identification
@@ -146,6 +171,7 @@ async def transcribe_audio(
         callback_url: Optional callback URL for async processing
         min_speakers: Minimum number of speakers to detect
         max_speakers: Maximum number of speakers to detect
+        file_path: Path to the audio file; streamed from disk instead of held in memory
 
     Returns:
         dict: Transcription result from Whisper API
@@ -160,7 +186,11 @@ async def transcribe_audio(
         timestamp_granularities = DEFAULT_TIMESTAMP_GRANULARITIES
 
     # Validate inputs
-    validate_file_content(file_content, filename)
+    if file_path is not None:
+        filename = filename or Path(file_path).name
+        validate_file_path(file_path, filename)
+    else:
+        validate_file_content(file_content, filename)
     validate_parameters(language, min_speakers, max_speakers, timestamp_granularities)
 
     # Validate API configuration
@@ -185,123 +215,116 @@ async def transcribe_audio(
     logger.info(f"Starting transcription for: {filename}")
     logger.debug(f"API parameters: language={language}, speaker_labels={speaker_labels}, translate={translate}")
 
-    # Create temporary file for upload
     file_extension = Path(filename).suffix.lower()
     if not file_extension:
         file_extension = '.mp3'  # Default extension
 
-    with tempfile.NamedTemporaryFile(suffix=file_extension, delete=False) as temp_file:
-        temp_file.write(file_content)
-        temp_file_path = temp_file.name
+    # Make API request with retry logic
+    last_exception = None
 
-    try:
-        # Make API request with retry logic
-        last_exception = None
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                # Prepare form data
-                data = aiohttp.FormData()
-
-                # Add file
-                with open(temp_file_path, 'rb') as file_handle:
-                    data.add_field(
-                        'file',
-                        file_handle,
-                        filename=filename,
-                        content_type=get_content_type(file_extension)
-                    )
-
-                # Add model
-                data.add_field('model', 'whisper-1')
-
-                # Add required parameters
-                data.add_field('response_format', response_format)
-
-                # Add language (convert to ISO code if needed)
-                language_code = convert_language_to_code(language)
-                if language_code:
-                    data.add_field('language', language_code)
-
-                # Add optional parameters
-                if prompt and prompt.strip():
-                    data.add_field('prompt', prompt.strip())
-
-                # Add timestamp granularities for verbose_json
-                if response_format == "verbose_json":
-                    for granularity in timestamp_granularities:
-                        data.add_field('timestamp_granularities[]', granularity)
-
-                logger.debug(f"API request attempt {attempt + 1}/{MAX_RETRIES}")
-
-                async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
-                    async with session.post(endpoint, headers=headers, data=data) as response:
-
-                        # Log response details in dev mode
-                        if ENV == "dev":
-                            logger.info(f"Whisper API response status: {response.status}")
-                            logger.debug(f"Response headers: {dict(response.headers)}")
-
-                        if response.status == 200:
-                            result = await response.json()
-
-                            # Post-process for speaker diarization if needed
-                            if speaker_labels and min_speakers and min_speakers > 1:
-                                result = add_speaker_diarization(result, min_speakers, max_speakers)
-
-                            logger.info(f"Transcription completed successfully for: {filename}")
-                            return result
-                        else:
-                            error_text = await response.text()
-
-                            # Don't retry for client errors (4xx)
-                            if 400 <= response.status < 500:
-                                logger.error(f"Client error: {response.status} - {error_text}")
-                                raise WhisperAPIError(f"API client error: {response.status}")
-
-                            # Retry for server errors (5xx)
-                            raise aiohttp.ClientResponseError(
-                                request_info=response.request_info,
-                                history=response.history,
-                                status=response.status,
-                                message=error_text
-                            )
-
-            except asyncio.TimeoutError as e:
-                last_exception = e
-                logger.warning(f"Request timeout on attempt {attempt + 1}: {e}")
-
-            except aiohttp.ClientConnectionError as e:
-                last_exception = e
-                logger.warning(f"Connection error on attempt {attempt + 1}: {e}")
-
-            except aiohttp.ClientResponseError as e:
-                # Don't retry for client errors (4xx)
-                if 400 <= e.status < 500:
-                    raise WhisperAPIError(f"API client error: {e.status}")
-
-                # Retry for server errors (5xx)
-                last_exception = e
-                logger.warning(f"Server error on attempt {attempt + 1}: {e}")
-
-            except Exception as e:
-                logger.error(f"Unexpected error during transcription: {e}")
-                raise WhisperAPIError(f"Transcription failed: {str(e)}")
-
-            # Wait before retry
-            if attempt < MAX_RETRIES - 1:
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
-
-        # All retries failed
-        logger.error(f"All {MAX_RETRIES} retry attempts failed")
-        raise WhisperAPIError(f"API request failed after {MAX_RETRIES} attempts: {str(last_exception)}")
-
-    finally:
-        # Clean up temporary file
+    for attempt in range(MAX_RETRIES):
+        file_handle = None
         try:
-            os.unlink(temp_file_path)
-        except OSError:
-            pass
+            # Prepare form data
+            data = aiohttp.FormData()
+
+            # Add file (streamed from disk when a path is given)
+            if file_path is not None:
+                file_handle = open(file_path, 'rb')
+            data.add_field(
+                'file',
+                file_handle or file_content,
+                filename=filename,
+                content_type=get_content_type(file_extension)
+            )
+
+            # Add model
+            data.add_field('model', 'whisper-1')
+
+            # Add required parameters
+            data.add_field('response_format', response_format)
+
+            # Add language (convert to ISO code if needed)
+            language_code = convert_language_to_code(language)
+            if language_code:
+                data.add_field('language', language_code)
+
+            # Add optional parameters
+            if prompt and prompt.strip():
+                data.add_field('prompt', prompt.strip())
+
+            # Add timestamp granularities for verbose_json
+            if response_format == "verbose_json":
+                for granularity in timestamp_granularities:
+                    data.add_field('timestamp_granularities[]', granularity)
+
+            logger.debug(f"API request attempt {attempt + 1}/{MAX_RETRIES}")
+
+            async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+                async with session.post(endpoint, headers=headers, data=data) as response:
+
+                    # Log response details in dev mode
+                    if ENV == "dev":
+                        logger.info(f"Whisper API response status: {response.status}")
+                        logger.debug(f"Response headers: {dict(response.headers)}")
+
+                    if response.status == 200:
+                        result = await response.json()
+
+                        # Post-process for speaker diarization if needed
+                        if speaker_labels and min_speakers and min_speakers > 1:
+                            result = add_speaker_diarization(result, min_speakers, max_speakers)
+
+                        logger.info(f"Transcription completed successfully for: {filename}")
+                        return result
+                    else:
+                        error_text = await response.text()
+
+                        # Don't retry for client errors (4xx)
+                        if 400 <= response.status < 500:
+                            logger.error(f"Client error: {response.status} - {error_text}")
+                            raise WhisperAPIError(f"API client error: {response.status}")
+
+                        # Retry for server errors (5xx)
+                        raise aiohttp.ClientResponseError(
+                            request_info=response.request_info,
+                            history=response.history,
+                            status=response.status,
+                            message=error_text
+                        )
+
+        except asyncio.TimeoutError as e:
+            last_exception = e
+            logger.warning(f"Request timeout on attempt {attempt + 1}: {e}")
+
+        except aiohttp.ClientConnectionError as e:
+            last_exception = e
+            logger.warning(f"Connection error on attempt {attempt + 1}: {e}")
+
+        except aiohttp.ClientResponseError as e:
+            # Don't retry for client errors (4xx)
+            if 400 <= e.status < 500:
+                raise WhisperAPIError(f"API client error: {e.status}")
+
+            # Retry for server errors (5xx)
+            last_exception = e
+            logger.warning(f"Server error on attempt {attempt + 1}: {e}")
+
+        except Exception as e:
+            logger.error(f"Unexpected error during transcription: {e}")
+            raise WhisperAPIError(f"Transcription failed: {str(e)}")
+
+        finally:
+            if file_handle is not None:
+                file_handle.close()
+
+        # Wait before retry
+        if attempt < MAX_RETRIES - 1:
+            await asyncio.sleep(2 ** attempt)  # Exponential backoff
+
+    # All retries failed
+    logger.error(f"All {MAX_RETRIES} retry attempts failed")
+    raise WhisperAPIError(f"API request failed after {MAX_RETRIES} attempts: {str(last_exception)}")
 
 
 def get_content_type(file_extension: str) -> str:
@@ -76,13 +76,19 @@ DEFAULT_OUTPUT_FORMAT = os.getenv("DEFAULT_OUTPUT_FORMAT", "markdown")
 DEFAULT_SPEAKER_LABELS = safe_bool(os.getenv("DEFAULT_SPEAKER_LABELS"), True)
 DEFAULT_TRANSLATE = safe_bool(os.getenv("DEFAULT_TRANSLATE"), False)
 
+# 🧠 Seconds to cache Claude analysis reports for identical requests (0 disables the cache)
+CLAUDE_CACHE_TTL = max(0, safe_int(os.getenv("CLAUDE_CACHE_TTL"), 86400))
+
+# 📂 Directory for temporary upload files (e.g. /dev/shm for tmpfs); system default if unset
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
 # 👥 Security - allowed usernames (опционально для dev)
 ALLOWED_USERNAMES_STR = os.getenv("ALLOWED_USERNAMES", "")
-ALLOWED_USERNAMES = {
+ALLOWED_USERNAMES = frozenset(
     username.strip().lower()
     for username in ALLOWED_USERNAMES_STR.split(",")
     if username.strip()
-}
+)
 
 # В dev режиме не требуем пользователей
 if ENV == "prod" and not ALLOWED_USERNAMES:
@@ -102,6 +108,8 @@ if not JWT_SECRET:
 
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRES_MINUTES = safe_int(os.getenv("JWT_EXPIRES_MINUTES"), 30)
+# Seconds to cache verified tokens (0 disables the cache)
+JWT_CACHE_TTL = max(0, safe_int(os.getenv("JWT_CACHE_TTL"), 30))
 
 # 📊 Value validation and correction
 if JWT_EXPIRES_MINUTES < 1:
@@ -120,9 +128,11 @@ class Config:
     JWT_SECRET = JWT_SECRET
     JWT_ALGORITHM = JWT_ALGORITHM
     JWT_EXPIRES_MINUTES = JWT_EXPIRES_MINUTES
+    JWT_CACHE_TTL = JWT_CACHE_TTL
 
     CLAUDE_API_KEY = CLAUDE_API_KEY
     CLAUDE_API_URL = CLAUDE_API_URL
+    CLAUDE_CACHE_TTL = CLAUDE_CACHE_TTL
 
     WHISPER_API_KEY = WHISPER_API_KEY
     WHISPER_API_URL = WHISPER_API_URL
@@ -134,6 +144,8 @@ class Config:
     DEFAULT_MIN_SPEAKERS = DEFAULT_MIN_SPEAKERS
     DEFAULT_MAX_SPEAKERS = DEFAULT_MAX_SPEAKERS
 
+    UPLOAD_TMP_DIR = UPLOAD_TMP_DIR
+
     ENV = ENV
     ALLOWED_USERNAMES = ALLOWED_USERNAMES
 
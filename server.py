@@ -1,26 +1,33 @@
 import os
+import re
 import asyncio
 import logging
 import hashlib
+import hmac
 import json
+import time
 import uuid
+import tempfile
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
-import io
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
 
 import aiohttp
-from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Form, Depends, Header, HTTPException, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from cachetools import TTLCache
 import jwt
 import asyncpg
-from urllib.parse import parse_qs, unquote
+from urllib.parse import parse_qsl
 
 # Импортируем утилиты
-from utils.claude_analyzer import generate_speaking_analysis
-from api.whisper import transcribe_audio
+from utils.claude_analyzer import generate_speaking_analysis, close_session as close_claude_session
+from utils.jwt_cache import TokenCache
+from api.whisper import transcribe_audio, MAX_FILE_SIZE
 from config import Config
 
 # Logging setup
@@ -29,6 +36,29 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Audio Transcription API")
 
+
+class LimitUploadSize:
+    """Pure ASGI middleware rejecting requests whose Content-Length exceeds the limit"""
+
+    def __init__(self, app, max_upload_size: int):
+        self.app = app
+        self.max_upload_size = max_upload_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_upload_size:
+                        response = JSONResponse(status_code=413, content={"detail": "File too large"})
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
+# Upload size limit (audio limit + headroom for multipart form fields)
+app.add_middleware(LimitUploadSize, max_upload_size=MAX_FILE_SIZE + 1024 * 1024)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -43,7 +73,14 @@ app.mount("/mini_app", StaticFiles(directory="mini_app", html=True), name="mini_
 
 
 # Pydantic models
+
+# Response models are built once per request and never mutated
+_RESPONSE_CONFIG = ConfigDict(frozen=True)
+
+
 class TranscriptionResponse(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     transcript: str
     filename: str
     output_format: str
@@ -55,11 +92,15 @@ class AuthRequest(BaseModel):
 
 
 class AuthResponse(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     access_token: str
     user_id: int
 
 
 class AnalysisTaskResponse(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     task_id: str
     status: str
     estimated_time: Optional[str] = None
@@ -67,6 +108,8 @@ class AnalysisTaskResponse(BaseModel):
 
 
 class TaskStatusResponse(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     task_id: str
     status: str
     progress: int
@@ -80,105 +123,153 @@ class SendReportRequest(BaseModel):
 
 
 class SendReportResponse(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     success: bool
     message: str
 
 
-# Database connection
-async def get_database():
-    try:
-        conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
+# Database connection pool (created on startup)
+db_pool: Optional[asyncpg.Pool] = None
+
+
+def get_db_pool() -> asyncpg.Pool:
+    if db_pool is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
+    return db_pool
 
 
 # JWT utilities
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
+    lifetime = expires_delta if expires_delta else timedelta(hours=24)
+    # Integer epoch seconds; avoids naive utcnow() datetimes
+    to_encode["exp"] = int(time.time() + lifetime.total_seconds())
     encoded_jwt = jwt.encode(to_encode, Config.JWT_SECRET, algorithm="HS256")
     return encoded_jwt
 
 
-def verify_token(token: str) -> dict:
-    try:
-        payload = jwt.decode(token, Config.JWT_SECRET, algorithms=["HS256"])
+# Cache of verified token payloads (entries live min(JWT_CACHE_TTL, token exp))
+token_cache = TokenCache(maxsize=10000, ttl=Config.JWT_CACHE_TTL)
+
+
+# Dependency for token verification (one decode; PyJWT enforces required claims)
+async def auth(authorization: Optional[str] = Header(None)) -> dict:
+    # Схема в заголовке регистронезависима (RFC 7235): "bearer" тоже принимаем
+    scheme, _, token = (authorization or "").partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+
+    payload = token_cache.get(token)
+    if payload is not None:
         return payload
+
+    try:
+        payload = jwt.decode(
+            token, Config.JWT_SECRET, algorithms=["HS256"],
+            options={"require": ["exp", "sub", "id"]}
+        )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    token_cache.set(token, payload)
+    return payload
 
-# Dependency for token verification
-async def verify_token_dependency(authorization: str = None) -> dict:
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
 
-    try:
-        scheme, token = authorization.split()
-        if scheme.lower() != "bearer":
-            raise HTTPException(status_code=401, detail="Invalid authentication scheme")
-        return verify_token(token)
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
+# Telegram WebApp data verification
+
+# Secret key derived once from the bot token: HMAC_SHA256("WebAppData", bot_token)
+_TG_SECRET = (
+    hmac.new(b"WebAppData", Config.TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    if Config.TELEGRAM_BOT_TOKEN else None
+)
 
 
-# Telegram WebApp data verification
 def verify_telegram_webapp_data(init_data: str) -> dict:
     try:
-        # Parse the init_data
-        parsed_data = parse_qs(init_data)
+        # Parse the init_data in one pass, separating out the hash
+        received_hash = None
+        items = []
+        for key, value in parse_qsl(init_data, keep_blank_values=True):
+            if key == 'hash':
+                received_hash = value
+            else:
+                items.append((key, value))
 
-        # Extract hash and other parameters
-        received_hash = parsed_data.get('hash', [None])[0]
         if not received_hash:
             raise ValueError("Hash not found in init_data")
 
-        # Remove hash from data for verification
-        data_check_string_parts = []
-        for key, value in parsed_data.items():
-            if key != 'hash':
-                if isinstance(value, list) and len(value) > 0:
-                    data_check_string_parts.append(f"{key}={value[0]}")
-
-        data_check_string = '\n'.join(sorted(data_check_string_parts))
+        items.sort()
+        data_check_string = '\n'.join(f"{key}={value}" for key, value in items)
 
-        # Create secret key
-        bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        if not bot_token:
+        # Secret key is precomputed at import
+        if _TG_SECRET is None:
             raise ValueError("TELEGRAM_BOT_TOKEN not found")
 
-        secret_key = hashlib.sha256(bot_token.encode()).digest()
+        # Calculate hash as specified by Telegram: HMAC_SHA256(secret_key, data_check_string)
+        calculated_hash = hmac.new(_TG_SECRET, data_check_string.encode(), hashlib.sha256).hexdigest()
 
-        # Calculate hash
-        calculated_hash = hashlib.sha256(
-            hashlib.sha256(data_check_string.encode()).digest() + secret_key
-        ).hexdigest()
-
-        if calculated_hash != received_hash:
+        if not hmac.compare_digest(calculated_hash, received_hash):
             raise ValueError("Hash verification failed")
 
-        # Parse user data
-        user_data = parsed_data.get('user', [None])[0]
+        # Parse user data (values are already URL-decoded by parse_qsl)
+        user_data = dict(items).get('user')
         if user_data:
-            user_info = json.loads(unquote(user_data))
+            user_info = json.loads(user_data)
             return user_info
         else:
             raise ValueError("User data not found")
 
     except Exception as e:
-        logger.error(f"Telegram data verification failed: {e}")
+        logger.error("Telegram data verification failed: %s", e)
         raise HTTPException(status_code=401, detail="Invalid Telegram data")
 
 
+# Characters not allowed in generated file names
+_SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _sanitize_filename(name: str) -> str:
+    """Strip unsafe characters from a client-supplied file name"""
+    return _SAFE_NAME_RE.sub("", name)[:100] or "upload"
+
+
+def _upload_filename(file: UploadFile) -> str:
+    """Base name of an uploaded file with any client-side directory parts removed"""
+    return Path(file.filename.replace("\\", "/")).name
+
+
+# Chunk size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def save_upload_to_temp(file: UploadFile) -> Tuple[str, int]:
+    """Stream an uploaded file to a temporary file and return its path and size"""
+    suffix = Path(file.filename or "").suffix.lower()
+    temp_file = await run_in_threadpool(
+        tempfile.NamedTemporaryFile, delete=False, suffix=suffix, dir=Config.UPLOAD_TMP_DIR
+    )
+    size = 0
+    try:
+        with temp_file:
+            # Disk writes run in the threadpool so they don't block the event loop
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await run_in_threadpool(temp_file.write, chunk)
+                size += len(chunk)
+    except Exception:
+        Path(temp_file.name).unlink(missing_ok=True)
+        raise
+    return temp_file.name, size
+
+
 # Telegram Bot API functions
+
+# Shared HTTP session for Telegram Bot API calls (created on startup)
+telegram_session: Optional[aiohttp.ClientSession] = None
+
 async def send_document_to_user(chat_id: int, html_content: str, filename: str) -> dict:
     """Отправка HTML документа пользователю через Telegram Bot API"""
     bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -186,11 +277,8 @@ async def send_document_to_user(chat_id: int, html_content: str, filename: str)
         raise HTTPException(status_code=500, detail="Telegram bot token not configured")
 
     try:
-        # Создаем полный HTML документ
-        full_html = create_full_html_report(html_content, filename)
-
-        # Конвертируем в байты
-        file_content = full_html.encode('utf-8')
+        # Создаем полный HTML документ (уже в байтах)
+        file_content = create_full_html_report(html_content, filename)
 
         # Подготавливаем данные для отправки
         url = f"https://api.telegram.org/bot{bot_token}/sendDocument"
@@ -199,46 +287,34 @@ async def send_document_to_user(chat_id: int, html_content: str, filename: str)
         data = aiohttp.FormData()
         data.add_field('chat_id', str(chat_id))
         data.add_field('document', file_content,
-                       filename=f"{filename}_analysis_report.html",
+                       filename=f"{_sanitize_filename(filename)}_analysis_report.html",
                        content_type='text/html; charset=utf-8')
         data.add_field('caption',
                        f'📄 Your AI analysis report is ready!\n\n📁 File: {filename}\n🧠 Generated by Claude AI\n\n💡 Open this file in any web browser to view the full report.')
 
-        # Отправляем запрос
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=data) as response:
-                result = await response.json()
+        # Отправляем запрос через общую сессию (keep-alive к api.telegram.org)
+        async with telegram_session.post(url, data=data) as response:
+            result = await response.json()
 
-                if not result.get('ok'):
-                    error_msg = result.get('description', 'Unknown Telegram API error')
-                    logger.error(f"Telegram API error: {error_msg}")
-                    raise HTTPException(status_code=500, detail=f"Failed to send document: {error_msg}")
+            if not result.get('ok'):
+                error_msg = result.get('description', 'Unknown Telegram API error')
+                logger.error("Telegram API error: %s", error_msg)
+                raise HTTPException(status_code=500, detail=f"Failed to send document: {error_msg}")
 
-                logger.info(f"Document sent successfully to chat {chat_id}")
-                return result
+            logger.info("Document sent successfully to chat %s", chat_id)
+            return result
 
     except aiohttp.ClientError as e:
-        logger.error(f"HTTP error when sending document: {e}")
+        logger.error("HTTP error when sending document: %s", e)
         raise HTTPException(status_code=500, detail="Failed to connect to Telegram API")
     except Exception as e:
-        logger.error(f"Unexpected error when sending document: {e}")
+        logger.error("Unexpected error when sending document: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to send document: {str(e)}")
 
 
-def create_full_html_report(content: str, filename: str) -> str:
-    """Создание полного HTML документа с встроенными стилями"""
-
-    # Экранируем специальные символы в контенте
-    safe_content = content.replace('`', '\\`').replace('${', '\\${')
-
-    return f"""<!DOCTYPE html>
-<html lang="ru">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>AI Analysis Report - {filename}</title>
-    <style>
-        body {{
+# Static parts of the HTML report (built once at import)
+_REPORT_STYLE = """    <style>
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
             line-height: 1.6;
             color: #333;
@@ -246,9 +322,9 @@ def create_full_html_report(content: str, filename: str) -> str:
             margin: 0 auto;
             padding: 20px;
             background: #f8f9fa;
-        }}
+        }
 
-        .report-header {{
+        .report-header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 30px;
@@ -256,219 +332,258 @@ def create_full_html_report(content: str, filename: str) -> str:
             margin-bottom: 30px;
             text-align: center;
             box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);
-        }}
+        }
 
-        .report-header h1 {{
+        .report-header h1 {
             margin: 0;
             font-size: 2.5em;
             font-weight: 700;
             text-shadow: 0 2px 4px rgba(0,0,0,0.3);
-        }}
+        }
 
-        .report-header .subtitle {{
+        .report-header .subtitle {
             margin: 10px 0 0 0;
             font-size: 1.1em;
             opacity: 0.9;
-        }}
+        }
 
-        .report-container {{
+        .report-container {
             background: white;
             padding: 40px;
             border-radius: 12px;
             box-shadow: 0 4px 20px rgba(0,0,0,0.1);
             margin-bottom: 30px;
-        }}
+        }
 
-        .metadata {{
+        .metadata {
             background: #e3f2fd;
             border-left: 4px solid #2196F3;
             padding: 15px 20px;
             margin-bottom: 30px;
             border-radius: 0 8px 8px 0;
-        }}
+        }
 
-        .metadata strong {{
+        .metadata strong {
             color: #1976D2;
-        }}
+        }
 
-        h1, h2, h3, h4 {{
+        h1, h2, h3, h4 {
             color: #2c3e50;
             margin-top: 30px;
             margin-bottom: 15px;
             font-weight: 600;
-        }}
+        }
 
-        h1 {{
+        h1 {
             font-size: 2.2em;
             border-bottom: 3px solid #3498db;
             padding-bottom: 15px;
             margin-top: 0;
-        }}
+        }
 
-        h2 {{
+        h2 {
             font-size: 1.6em;
             border-left: 4px solid #3498db;
             padding-left: 20px;
             background: #f8f9fa;
             padding: 15px 20px;
             border-radius: 0 8px 8px 0;
-        }}
+        }
 
-        h3 {{
+        h3 {
             font-size: 1.3em;
             color: #34495e;
-        }}
+        }
 
-        p {{
+        p {
             margin: 15px 0;
             text-align: justify;
-        }}
+        }
 
-        ul, ol {{
+        ul, ol {
             margin: 15px 0;
             padding-left: 30px;
-        }}
+        }
 
-        li {{
+        li {
             margin: 8px 0;
             line-height: 1.5;
-        }}
+        }
 
-        .highlight {{
+        .highlight {
             background: #fff3cd;
             padding: 4px 8px;
             border-radius: 4px;
             border: 1px solid #ffeaa7;
             font-weight: 500;
-        }}
+        }
 
-        .section {{
+        .section {
             margin: 30px 0;
             padding: 25px;
             background: #f8f9fa;
             border-radius: 8px;
             border: 1px solid #dee2e6;
-        }}
+        }
 
-        blockquote {{
+        blockquote {
             margin: 25px 0;
             padding: 20px 25px;
             background: #e8f4f8;
             border-left: 5px solid #3498db;
             font-style: italic;
             border-radius: 0 8px 8px 0;
-        }}
+        }
 
-        .summary-box {{
+        .summary-box {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 25px;
             border-radius: 12px;
             margin: 30px 0;
             box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);
-        }}
+        }
 
-        .summary-box h2 {{
+        .summary-box h2 {
             color: white;
             margin-top: 0;
             border: none;
             background: none;
             padding: 0;
-        }}
+        }
 
-        .key-points {{
+        .key-points {
             background: #e8f5e8;
             border-left: 5px solid #4CAF50;
             padding: 20px;
             margin: 20px 0;
             border-radius: 0 8px 8px 0;
-        }}
+        }
 
-        .warning-box {{
+        .warning-box {
             background: #fff3cd;
             border-left: 5px solid #ffc107;
             padding: 20px;
             margin: 20px 0;
             border-radius: 0 8px 8px 0;
-        }}
+        }
 
-        .info-box {{
+        .info-box {
             background: #d1ecf1;
             border-left: 5px solid #17a2b8;
             padding: 20px;
             margin: 20px 0;
             border-radius: 0 8px 8px 0;
-        }}
+        }
 
-        .footer {{
+        .footer {
             text-align: center;
             padding: 30px;
             border-top: 1px solid #dee2e6;
             color: #6c757d;
             font-size: 0.9em;
             margin-top: 40px;
-        }}
+        }
 
         /* Print styles */
-        @media print {{
-            body {{
+        @media print {
+            body {
                 background: white;
                 padding: 0;
                 margin: 0;
                 font-size: 12pt;
-            }}
+            }
 
-            .report-header, .summary-box {{
+            .report-header, .summary-box {
                 background: #f0f0f0 !important;
                 color: #333 !important;
                 -webkit-print-color-adjust: exact;
                 print-color-adjust: exact;
-            }}
+            }
 
-            .report-container {{
+            .report-container {
                 box-shadow: none;
                 margin: 0;
                 padding: 20px;
-            }}
+            }
 
-            h1, h2 {{
+            h1, h2 {
                 page-break-after: avoid;
-            }}
+            }
 
-            ul, ol {{
+            ul, ol {
                 page-break-inside: avoid;
-            }}
-        }}
+            }
+        }
 
         /* Mobile responsive */
-        @media (max-width: 768px) {{
-            body {{
+        @media (max-width: 768px) {
+            body {
                 padding: 10px;
-            }}
+            }
 
-            .report-header, .report-container {{
+            .report-header, .report-container {
                 padding: 20px;
-            }}
+            }
 
-            .report-header h1 {{
+            .report-header h1 {
                 font-size: 2em;
-            }}
+            }
 
-            h1 {{
+            h1 {
                 font-size: 1.8em;
-            }}
+            }
 
-            h2 {{
+            h2 {
                 font-size: 1.4em;
                 padding: 10px 15px;
-            }}
-        }}
+            }
+        }
     </style>
-</head>
+"""
+
+_REPORT_FOOTER = """    <div class="footer">
+        <p>📄 This report was automatically generated using AI technology.</p>
+        <p>🔗 Generated by Audio Transcription Bot • Powered by Claude AI</p>
+        <p>💡 For questions or support, contact the bot administrator.</p>
+    </div>
+</body>
+</html>"""
+
+
+# Backticks and "${" are escaped in a single pass over the report content
+_TEMPLATE_ESCAPE_RE = re.compile(r'`|\$\{')
+
+
+# Static report fragments pre-encoded to UTF-8 once
+_REPORT_HEAD_B = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>AI Analysis Report - """.encode("utf-8")
+
+_REPORT_BODY_START_B = f"""</title>
+{_REPORT_STYLE}</head>
 <body>
     <div class="report-header">
         <h1>🧠 AI Analysis Report</h1>
-        <div class="subtitle">Powered by Claude AI • Generated on {datetime.now().strftime('%B %d, %Y at %H:%M')}</div>
+        <div class="subtitle">Powered by Claude AI • Generated on """.encode("utf-8")
+
+_REPORT_END_B = f"""
+    </div>
+
+{_REPORT_FOOTER}""".encode("utf-8")
+
+
+def create_full_html_report(content: str, filename: str) -> bytes:
+    """Создание полного HTML документа с встроенными стилями (UTF-8 bytes)"""
+
+    # Экранируем специальные символы в контенте
+    safe_content = _TEMPLATE_ESCAPE_RE.sub(lambda m: '\\' + m.group(0), content)
+
+    # Only the dynamic fields are encoded per call
+    metadata = f"""{datetime.now().strftime('%B %d, %Y at %H:%M')}</div>
     </div>
 
     <div class="metadata">
@@ -479,84 +594,240 @@ def create_full_html_report(content: str, filename: str) -> str:
     </div>
 
     <div class="report-container">
-        {safe_content}
-    </div>
+        """
 
-    <div class="footer">
-        <p>📄 This report was automatically generated using AI technology.</p>
-        <p>🔗 Generated by Audio Transcription Bot • Powered by Claude AI</p>
-        <p>💡 For questions or support, contact the bot administrator.</p>
-    </div>
-</body>
-</html>"""
+    return b"".join((
+        _REPORT_HEAD_B,
+        filename.encode("utf-8"),
+        _REPORT_BODY_START_B,
+        metadata.encode("utf-8"),
+        safe_content.encode("utf-8"),
+        _REPORT_END_B,
+    ))
+
+
+# Batched writer for transcription history rows
+INSERT_BATCH_SIZE = 100
+INSERT_FLUSH_INTERVAL = 0.05  # seconds to wait for more rows before flushing
+INSERT_DRAIN_TIMEOUT = 10  # seconds the shutdown handler waits for queued rows
+
+_TRANSCRIPTION_INSERT = """
+    INSERT INTO transcription (user_id, filename, transcript, output_format, created_at)
+    VALUES ($1, $2, $3, $4, $5)
+"""
+
+_insert_queue: Optional[asyncio.Queue] = None
+_insert_writer: Optional[asyncio.Task] = None
+
+
+async def save_transcription(user_id: int, filename: str, transcript: str,
+                             output_format: str, flush: bool = False):
+    """Queue a transcription row for the batched writer (flush=True writes it immediately)"""
+    pool = get_db_pool()
+    row = (user_id, filename, transcript, output_format, datetime.utcnow())
+
+    if flush or _insert_queue is None:
+        async with pool.acquire() as conn:
+            await conn.execute(_TRANSCRIPTION_INSERT, *row)
+        return
 
+    _insert_queue.put_nowait(row)
 
-# In-memory storage for async tasks
-tasks_storage: Dict[str, Dict[str, Any]] = {}
 
+async def _write_transcriptions(rows: list):
+    try:
+        async with get_db_pool().acquire() as conn:
+            try:
+                await conn.executemany(_TRANSCRIPTION_INSERT, rows)
+                return
+            except Exception as e:
+                logger.warning("Batch insert of %d transcription rows failed, retrying one by one: %s",
+                               len(rows), e)
+
+            # Одна битая строка не должна терять весь батч
+            for row in rows:
+                try:
+                    await conn.execute(_TRANSCRIPTION_INSERT, *row)
+                except Exception as e:
+                    logger.error("Failed to save transcription %s for user %s: %s", row[1], row[0], e)
+    except Exception as e:
+        logger.error("Failed to save %d transcription rows: %s", len(rows), e)
+
+
+async def _transcription_writer(queue: asyncio.Queue):
+    """Drain the insert queue, writing up to INSERT_BATCH_SIZE rows per round trip; stops on None"""
+    while True:
+        row = await queue.get()
+        if row is None:
+            return
+        rows = [row]
+        if queue.qsize() < INSERT_BATCH_SIZE - 1:
+            await asyncio.sleep(INSERT_FLUSH_INTERVAL)
+        while not queue.empty() and len(rows) < INSERT_BATCH_SIZE:
+            row = queue.get_nowait()
+            if row is None:
+                await _write_transcriptions(rows)
+                return
+            rows.append(row)
+        await _write_transcriptions(rows)
+
+
+# In-memory storage for async tasks. Pending/processing tasks live in _running_tasks
+# and are never evicted; finished tasks move to tasks_storage, which is bounded and
+# drops them TASKS_TTL after they finished.
+TASKS_MAX = 1000
+TASKS_TTL = 3600  # seconds
+TASKS_REAP_INTERVAL = 60  # seconds
+
+_running_tasks: Dict[str, Dict[str, Any]] = {}
+tasks_storage: TTLCache = TTLCache(maxsize=TASKS_MAX, ttl=TASKS_TTL)
+_tasks_reaper: Optional[asyncio.Task] = None
+
+
+async def _reap_expired_tasks():
+    """Evict expired tasks periodically, even if nobody touches the cache"""
+    while True:
+        await asyncio.sleep(TASKS_REAP_INTERVAL)
+        tasks_storage.expire()
+
+
+async def get_task(task_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Look up an async task in this worker's memory, falling back to the database.
+
+    Only completed tasks are persisted to analysistask, so a poll for a finished
+    task that lands on a different worker (or comes after a restart) still finds it.
+    Pending and failed tasks are visible only to the worker that runs them.
+    A database error is logged and reported as "not found".
+    """
+    task = _running_tasks.get(task_id) or tasks_storage.get(task_id)
+    if task is not None or db_pool is None:
+        return task
+
+    columns = "user_id, filename, status, created_at, completed_at"
+    if with_result:
+        columns += ", result"
+
+    try:
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(f"SELECT {columns} FROM analysistask WHERE id = $1", task_id)
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError, ValueError) as e:
+        logger.error("Task lookup for %s failed: %s", task_id, e)
+        return None
+
+    if row is None:
+        return None
+
+    task = dict(row)
+    task["progress"] = 100 if task["status"] == "completed" else 0
+    return task
 
-async def process_async_analysis(task_id: str, file_content: bytes, filename: str,
+
+def _result_etag(result: str) -> str:
+    """Strong ETag for a task result"""
+    return f'"{hashlib.sha256(result.encode()).hexdigest()}"'
+
+
+async def process_async_analysis(task_id: str, file_path: str, filename: str,
                                  language: str, prompt: str, translate: bool,
                                  min_speakers: int, max_speakers: int, user_id: int):
     """Background task for async analysis processing"""
-    try:
-        # Update task status
-        tasks_storage[task_id]["status"] = "transcribing"
-        tasks_storage[task_id]["progress"] = 20
-
-        # Perform actual transcription with Whisper API
-        transcript_data = await transcribe_audio(
-            file_content=file_content,
-            filename=filename,
-            language=language,
-            translate=translate,
-            min_speakers=min_speakers,
-            max_speakers=max_speakers
-        )
+    task = _running_tasks[task_id]
 
-        # Update to analyzing
-        tasks_storage[task_id]["status"] = "analyzing"
-        tasks_storage[task_id]["progress"] = 60
+    def update_progress(stage: str, progress: int):
+        task.update(status=stage, progress=progress)
 
-        # Perform Claude analysis
+    try:
+        # Transcription + Claude analysis; progress is reported at each real milestone
         result = await generate_speaking_analysis(
-            file_content=file_content,
+            file_path=file_path,
             filename=filename,
             language=language,
             prompt=prompt,
             translate=translate,
             min_speakers=min_speakers,
-            max_speakers=max_speakers
+            max_speakers=max_speakers,
+            progress_cb=update_progress
         )
 
-        # Complete the task
-        tasks_storage[task_id]["status"] = "completed"
-        tasks_storage[task_id]["progress"] = 100
-        tasks_storage[task_id]["result"] = result
-        tasks_storage[task_id]["completed_at"] = datetime.utcnow()
+        # Complete the task; the result is kept for TASKS_TTL from now
+        task["status"] = "completed"
+        task["progress"] = 100
+        task["result"] = result
+        task["etag"] = _result_etag(result)
+        task["completed_at"] = datetime.utcnow()
+        tasks_storage[task_id] = task
+        _running_tasks.pop(task_id, None)
 
         # Save to database
-        conn = await get_database()
-        try:
+        async with get_db_pool().acquire() as conn:
             await conn.execute("""
                 INSERT INTO analysistask (id, user_id, filename, status, result, created_at, completed_at)
                 VALUES ($1, $2, $3, $4, $5, $6, $7)
             """, task_id, user_id, filename, "completed", result,
-                               tasks_storage[task_id]["created_at"], tasks_storage[task_id]["completed_at"])
-        finally:
-            await conn.close()
+                               task["created_at"], task["completed_at"])
 
     except Exception as e:
-        logger.error(f"Async analysis failed for task {task_id}: {e}")
-        tasks_storage[task_id]["status"] = "failed"
-        tasks_storage[task_id]["error"] = str(e)
+        logger.error("Async analysis failed for task %s: %s", task_id, e)
+        task["status"] = "failed"
+        task["error"] = str(e)
+        tasks_storage[task_id] = task
+
+    finally:
+        _running_tasks.pop(task_id, None)
+        Path(file_path).unlink(missing_ok=True)
+
+
+# Application lifecycle
+
+@app.on_event("startup")
+async def startup():
+    global telegram_session, db_pool, _insert_queue, _insert_writer, _tasks_reaper
+    _tasks_reaper = asyncio.create_task(_reap_expired_tasks())
+    telegram_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=75, ttl_dns_cache=300)
+    )
+    try:
+        db_pool = await asyncpg.create_pool(
+            os.getenv("DATABASE_URL"), min_size=5, max_size=20, statement_cache_size=100
+        )
+    except Exception as e:
+        logger.error("Database connection failed: %s", e)
+        return
+
+    _insert_queue = asyncio.Queue()
+    _insert_writer = asyncio.create_task(_transcription_writer(_insert_queue))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    global _insert_queue
+    if _tasks_reaper is not None:
+        _tasks_reaper.cancel()
+    if telegram_session is not None:
+        await telegram_session.close()
+    await close_claude_session()
+    if _insert_writer is not None:
+        # Новые строки пишутся напрямую; writer дописывает очередь до маркера None
+        queue, _insert_queue = _insert_queue, None
+        queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(_insert_writer, timeout=INSERT_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error("Transcription writer did not drain %d queued rows in time", queue.qsize())
+    if db_pool is not None:
+        await db_pool.close()
 
 
 # API Endpoints
 
+# Pre-encoded body for the root liveness endpoint
+_ROOT_BODY = json.dumps({"message": "Audio Transcription API is running"}).encode("utf-8")
+
+
 @app.get("/")
 async def root():
-    return {"message": "Audio Transcription API is running"}
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 
 @app.post("/auth", response_model=AuthResponse)
@@ -566,14 +837,22 @@ async def authenticate(request: AuthRequest):
         user_data = verify_telegram_webapp_data(request.initData)
         user_id = user_data["id"]
 
+        # Check username against allowlist (empty allowlist allows everyone)
+        username = str(user_data.get("username", "")).lower()
+        if Config.ALLOWED_USERNAMES and username not in Config.ALLOWED_USERNAMES:
+            logger.warning("User %s is not in allowed usernames", user_id)
+            raise HTTPException(status_code=403, detail="Access denied")
+
         # Create access token
         access_token = create_access_token(data={"sub": str(user_id), "id": user_id})
 
-        logger.info(f"User {user_id} authenticated successfully")
+        logger.info("User %s authenticated successfully", user_id)
         return AuthResponse(access_token=access_token, user_id=user_id)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Authentication failed: {e}")
+        logger.error("Authentication failed: %s", e)
         raise HTTPException(status_code=401, detail="Authentication failed")
 
 
@@ -587,28 +866,32 @@ async def upload_audio(
         speaker_labels: bool = Form(True),
         min_speakers: int = Form(1),
         max_speakers: int = Form(8),
-        user_data: dict = Depends(verify_token_dependency)
+        user_data: dict = Depends(auth)
 ):
     """Upload and transcribe audio file"""
     try:
         # Validate file
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
+        filename = _upload_filename(file)
 
-        # Read file content
-        file_content = await file.read()
-        if len(file_content) == 0:
-            raise HTTPException(status_code=400, detail="Empty file")
-
-        # Transcribe with Whisper API
-        transcript_data = await transcribe_audio(
-            file_content=file_content,
-            filename=file.filename,
-            language=language,
-            translate=translate,
-            min_speakers=min_speakers,
-            max_speakers=max_speakers
-        )
+        # Stream upload to disk instead of buffering it in memory
+        temp_path, file_size = await save_upload_to_temp(file)
+        try:
+            if file_size == 0:
+                raise HTTPException(status_code=400, detail="Empty file")
+
+            # Transcribe with Whisper API
+            transcript_data = await transcribe_audio(
+                file_path=temp_path,
+                filename=filename,
+                language=language,
+                translate=translate,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers
+            )
+        finally:
+            Path(temp_path).unlink(missing_ok=True)
 
         # Extract transcript text
         if isinstance(transcript_data, dict):
@@ -616,25 +899,18 @@ async def upload_audio(
         else:
             transcript = str(transcript_data)
 
-        # Save to database
-        conn = await get_database()
-        try:
-            await conn.execute("""
-                INSERT INTO transcription (user_id, filename, transcript, output_format, created_at)
-                VALUES ($1, $2, $3, $4, $5)
-            """, user_data["id"], file.filename, transcript, output_format, datetime.utcnow())
-        finally:
-            await conn.close()
+        # Save to database (batched in the background)
+        await save_transcription(user_data["id"], filename, transcript, output_format)
 
         return TranscriptionResponse(
             transcript=transcript,
-            filename=file.filename,
+            filename=filename,
             output_format=output_format,
             message="Audio transcribed successfully"
         )
 
     except Exception as e:
-        logger.error(f"Upload failed: {e}")
+        logger.error("Upload failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
@@ -647,42 +923,40 @@ async def analyze_audio(
         speaker_labels: bool = Form(True),
         min_speakers: int = Form(1),
         max_speakers: int = Form(8),
-        user_data: dict = Depends(verify_token_dependency)
+        user_data: dict = Depends(auth)
 ):
     """Synchronous audio analysis with Claude"""
     try:
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
+        filename = _upload_filename(file)
 
-        file_content = await file.read()
-        if len(file_content) == 0:
-            raise HTTPException(status_code=400, detail="Empty file")
-
-        # Perform analysis (includes transcription + Claude analysis)
-        result = await generate_speaking_analysis(
-            file_content=file_content,
-            filename=file.filename,
-            language=language,
-            prompt=prompt,
-            translate=translate,
-            min_speakers=min_speakers,
-            max_speakers=max_speakers
-        )
-
-        # Save to database
-        conn = await get_database()
+        # Stream upload to disk instead of buffering it in memory
+        temp_path, file_size = await save_upload_to_temp(file)
         try:
-            await conn.execute("""
-                INSERT INTO transcription (user_id, filename, transcript, output_format, created_at)
-                VALUES ($1, $2, $3, $4, $5)
-            """, user_data["id"], file.filename, result, "html_analysis", datetime.utcnow())
+            if file_size == 0:
+                raise HTTPException(status_code=400, detail="Empty file")
+
+            # Perform analysis (includes transcription + Claude analysis)
+            result = await generate_speaking_analysis(
+                file_path=temp_path,
+                filename=filename,
+                language=language,
+                prompt=prompt,
+                translate=translate,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers
+            )
         finally:
-            await conn.close()
+            Path(temp_path).unlink(missing_ok=True)
+
+        # Save to database (batched in the background)
+        await save_transcription(user_data["id"], filename, result, "html_analysis")
 
         return PlainTextResponse(content=result, media_type="text/html")
 
     except Exception as e:
-        logger.error(f"Analysis failed: {e}")
+        logger.error("Analysis failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
@@ -696,25 +970,28 @@ async def analyze_audio_async(
         speaker_labels: bool = Form(True),
         min_speakers: int = Form(1),
         max_speakers: int = Form(8),
-        user_data: dict = Depends(verify_token_dependency)
+        user_data: dict = Depends(auth)
 ):
     """Asynchronous audio analysis with Claude for large files"""
     try:
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
+        filename = _upload_filename(file)
 
-        file_content = await file.read()
-        if len(file_content) == 0:
+        # Spool the upload to disk; the background task owns (and removes) the file
+        temp_path, file_size = await save_upload_to_temp(file)
+        if file_size == 0:
+            Path(temp_path).unlink(missing_ok=True)
             raise HTTPException(status_code=400, detail="Empty file")
 
         # Generate task ID
         task_id = str(uuid.uuid4())
 
         # Initialize task
-        tasks_storage[task_id] = {
+        _running_tasks[task_id] = {
             "status": "pending",
             "progress": 0,
-            "filename": file.filename,
+            "filename": filename,
             "created_at": datetime.utcnow(),
             "user_id": user_data["id"]
         }
@@ -723,8 +1000,8 @@ async def analyze_audio_async(
         background_tasks.add_task(
             process_async_analysis,
             task_id=task_id,
-            file_content=file_content,
-            filename=file.filename,
+            file_path=temp_path,
+            filename=filename,
             language=language,
             prompt=prompt,
             translate=translate,
@@ -734,7 +1011,7 @@ async def analyze_audio_async(
         )
 
         # Estimate time based on file size
-        file_size_mb = len(file_content) / (1024 * 1024)
+        file_size_mb = file_size / (1024 * 1024)
         estimated_minutes = max(2, int(file_size_mb / 5))  # Rough estimate
         estimated_time = f"{estimated_minutes}-{estimated_minutes + 2} minutes"
 
@@ -746,39 +1023,38 @@ async def analyze_audio_async(
         )
 
     except Exception as e:
-        logger.error(f"Async analysis setup failed: {e}")
+        logger.error("Async analysis setup failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to start analysis: {str(e)}")
 
 
-@app.get("/task/{task_id}", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str, user_data: dict = Depends(verify_token_dependency)):
+@app.get("/task/{task_id}", response_model=TaskStatusResponse, response_class=ORJSONResponse)
+async def get_task_status(task_id: str, user_data: dict = Depends(auth)):
     """Get status of async analysis task"""
-    if task_id not in tasks_storage:
+    task = await get_task(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    task = tasks_storage[task_id]
-
     # Verify task belongs to user
     if task["user_id"] != user_data["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    return TaskStatusResponse(
-        task_id=task_id,
-        status=task["status"],
-        progress=task["progress"],
-        filename=task.get("filename"),
-        error=task.get("error")
-    )
+    # Polled frequently: serialize directly with orjson, skipping response_model validation
+    return ORJSONResponse({
+        "task_id": task_id,
+        "status": task["status"],
+        "progress": task["progress"],
+        "filename": task.get("filename"),
+        "error": task.get("error")
+    })
 
 
 @app.get("/task/{task_id}/result", response_class=PlainTextResponse)
-async def get_task_result(task_id: str, user_data: dict = Depends(verify_token_dependency)):
+async def get_task_result(task_id: str, request: Request, user_data: dict = Depends(auth)):
     """Get result of completed async analysis task"""
-    if task_id not in tasks_storage:
+    task = await get_task(task_id, with_result=True)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    task = tasks_storage[task_id]
-
     # Verify task belongs to user
     if task["user_id"] != user_data["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -789,13 +1065,21 @@ async def get_task_result(task_id: str, user_data: dict = Depends(verify_token_d
     if "result" not in task:
         raise HTTPException(status_code=500, detail="Task result not available")
 
-    return PlainTextResponse(content=task["result"], media_type="text/html")
+    # Results never change once completed, so repeat polls can skip the body
+    etag = task.get("etag") or _result_etag(task["result"])
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    return PlainTextResponse(content=task["result"], media_type="text/html", headers=headers)
 
 
 @app.post("/send-report", response_model=SendReportResponse)
 async def send_report(
         request: SendReportRequest,
-        user_data: dict = Depends(verify_token_dependency)
+        user_data: dict = Depends(auth)
 ):
     """Send analysis report to user's Telegram chat"""
     try:
@@ -815,7 +1099,7 @@ async def send_report(
             filename=request.filename
         )
 
-        logger.info(f"Report sent successfully to user {user_id} for file {request.filename}")
+        logger.info("Report sent successfully to user %s for file %s", user_id, request.filename)
 
         return SendReportResponse(
             success=True,
@@ -826,7 +1110,7 @@ async def send_report(
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Failed to send report to user {user_data['id']}: {e}")
+        logger.error("Failed to send report to user %s: %s", user_data['id'], e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to send report: {str(e)}"
@@ -834,44 +1118,43 @@ async def send_report(
 
 
 @app.get("/history")
-async def get_transcription_history(user_data: dict = Depends(verify_token_dependency)):
+async def get_transcription_history(user_data: dict = Depends(auth)):
     """Get user's transcription history"""
     try:
-        conn = await get_database()
-        try:
-            # Get transcriptions from both tables
-            transcriptions = await conn.fetch("""
-                SELECT filename, transcript, output_format, created_at, 'transcription' as source
-                FROM transcription 
-                WHERE user_id = $1
-                UNION ALL
-                SELECT filename, result as transcript, 'html_analysis' as output_format, completed_at as created_at, 'analysis' as source
-                FROM analysistask 
-                WHERE user_id = $1 AND status = 'completed'
-                ORDER BY created_at DESC
-                LIMIT 50
+        async with get_db_pool().acquire() as conn:
+            # Postgres builds the JSON array itself; the body is passed through as-is
+            history_json = await conn.fetchval("""
+                SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                    'filename', filename,
+                    'transcript', transcript,
+                    'output_format', output_format,
+                    'created_at', to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                    'source', source
+                ) ORDER BY created_at DESC), '[]'::jsonb)::text
+                FROM (
+                    SELECT filename, transcript, output_format, created_at, 'transcription' as source
+                    FROM transcription 
+                    WHERE user_id = $1
+                    UNION ALL
+                    SELECT filename, result as transcript, 'html_analysis' as output_format, completed_at as created_at, 'analysis' as source
+                    FROM analysistask 
+                    WHERE user_id = $1 AND status = 'completed'
+                    ORDER BY created_at DESC
+                    LIMIT 50
+                ) recent
             """, user_data["id"])
 
-            history = []
-            for row in transcriptions:
-                history.append({
-                    "filename": row["filename"],
-                    "transcript": row["transcript"],
-                    "output_format": row["output_format"],
-                    "created_at": row["created_at"].isoformat(),
-                    "source": row["source"]
-                })
-
-            return history
-
-        finally:
-            await conn.close()
+        return Response(content=history_json, media_type="application/json")
 
     except Exception as e:
-        logger.error(f"Failed to get history for user {user_data['id']}: {e}")
+        logger.error("Failed to get history for user %s: %s", user_data['id'], e)
         raise HTTPException(status_code=500, detail="Failed to retrieve history")
 
 
+# Build the OpenAPI schema once at import (after all routes are declared)
+app.openapi()
+
+
 if __name__ == "__main__":
     import uvicorn
 
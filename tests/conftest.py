@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# Конфиг читает окружение при импорте - задаём тестовые значения до любых импортов
+os.environ.setdefault("ENV", "prod")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST-TOKEN")
+os.environ.setdefault("JWT_SECRET", "test-secret-0123456789abcdef-0123456789")
+os.environ.setdefault("WHISPER_API_KEY", "test-whisper-key")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from utils import claude_analyzer
+from utils.claude_analyzer import ClaudeAnalyzerError, _split_transcript
+
+
+def test_split_keeps_order_around_oversized_line():
+    assert _split_transcript("aa\nbb\n" + "X" * 25, 10) == [
+        "aa\nbb", "X" * 10, "X" * 10, "X" * 5,
+    ]
+
+
+def test_split_respects_limit_and_loses_nothing():
+    transcript = "\n".join(f"Speaker {n % 3}: " + "word " * (n % 7) for n in range(200))
+    chunks = _split_transcript(transcript, 120)
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert "\n".join(chunks) == transcript
+
+
+def _fake_summaries(monkeypatch, failing):
+    async def fake_summarize(chunk, index, total, language):
+        if index in failing:
+            raise ClaudeAnalyzerError("boom")
+        return f"summary {index}"
+
+    monkeypatch.setattr(claude_analyzer, "_summarize_chunk", fake_summarize)
+    monkeypatch.setattr(claude_analyzer, "MAX_TRANSCRIPT_CHARS", 10)
+
+
+def test_condense_marks_failed_segments(monkeypatch):
+    _fake_summaries(monkeypatch, failing={2})
+    result = asyncio.run(claude_analyzer._condense_transcript("a" * 25, "english"))
+    assert "SEGMENT 1 of 3 SUMMARY:\nsummary 1" in result
+    assert "SEGMENT 2 of 3 SUMMARY:\n[MISSING" in result
+    assert "SEGMENT 3 of 3 SUMMARY:\nsummary 3" in result
+
+
+def test_condense_fails_when_every_segment_fails(monkeypatch):
+    _fake_summaries(monkeypatch, failing={1, 2, 3})
+    with pytest.raises(ClaudeAnalyzerError):
+        asyncio.run(claude_analyzer._condense_transcript("a" * 25, "english"))
+
+
+def test_analysis_prompt_keeps_instructions_around_transcript(monkeypatch):
+    sent = []
+
+    async def fake_stream(content, max_tokens=4000):
+        sent.extend(content)
+        yield "<!DOCTYPE html>"
+
+    monkeypatch.setattr(claude_analyzer, "_stream_claude", fake_stream)
+
+    async def run():
+        return [chunk async for chunk in claude_analyzer.stream_transcript_analysis("hello", "a.mp3")]
+
+    assert asyncio.run(run()) == ["<!DOCTYPE html>"]
+    (block,) = sent
+    assert "cache_control" not in block
+    text = block["text"]
+    assert text.startswith(claude_analyzer._PROMPT_HEAD)
+    assert text.endswith(claude_analyzer._PROMPT_TAIL)
+    assert text.index("TRANSCRIPT:\nhello") < text.index("- Filename: a.mp3")
+
+
+def test_wrap_in_html_does_not_expand_sentinels_in_filename():
+    page = claude_analyzer.wrap_in_html("<p>body</p>", "__CONTENT__.mp3")
+    assert page.count("<p>body</p>") == 1
+    assert page.count("__CONTENT__.mp3") == 2
+    assert "__TIMESTAMP__" not in page
+
+
+def test_format_transcript_with_speakers():
+    segments = [
+        {"speaker": "A", "start": 5.7, "text": " hello "},
+        {"speaker": "B", "start": 125.2, "text": "   "},
+        {"start": 3725.0, "text": "bye"},
+    ]
+    assert claude_analyzer.format_transcript_with_speakers("raw", segments) == (
+        "A [00:05]: hello\nSpeaker 1 [62:05]: bye"
+    )
+    assert claude_analyzer.format_transcript_with_speakers("raw", []) == "raw"
@@ -0,0 +1,88 @@
+import time
+
+import jwt
+import pytest
+
+from config import JWT_ALGORITHM, JWT_SECRET
+from utils import jwt_helper
+from utils.jwt_helper import (
+    JWTError,
+    create_access_token,
+    decode_token_payload,
+    is_token_expired,
+    verify_access_token,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    jwt_helper.clear_token_cache()
+    yield
+    jwt_helper.clear_token_cache()
+
+
+def test_round_trip():
+    token = create_access_token("  alice  ", {"role": "admin"})
+
+    assert verify_access_token(token) == "alice"
+    payload = decode_token_payload(token)
+    assert payload["sub"] == "alice"
+    assert payload["role"] == "admin"
+    assert payload["iss"] == jwt_helper.JWT_ISSUER
+    assert payload["exp"] - payload["iat"] == jwt_helper.JWT_EXPIRES_MINUTES * 60
+    assert not is_token_expired(token)
+
+
+def test_cached_verification_returns_same_user():
+    token = create_access_token("alice")
+
+    assert verify_access_token(token) == "alice"
+    assert verify_access_token(token) == "alice"
+
+
+def test_expired_token_rejected():
+    now = int(time.time())
+    token = jwt.encode(
+        {"sub": "alice", "iat": now - 120, "exp": now - 60,
+         "iss": jwt_helper.JWT_ISSUER, "aud": jwt_helper.JWT_AUDIENCE, "type": "access"},
+        JWT_SECRET, algorithm=JWT_ALGORITHM,
+    )
+
+    with pytest.raises(JWTError, match="expired"):
+        verify_access_token(token)
+    assert is_token_expired(token)
+
+
+@pytest.mark.parametrize("missing", ["exp", "iat", "sub", "iss", "aud"])
+def test_required_claims_enforced(missing):
+    now = int(time.time())
+    claims = {"sub": "alice", "iat": now, "exp": now + 60,
+              "iss": jwt_helper.JWT_ISSUER, "aud": jwt_helper.JWT_AUDIENCE}
+    del claims[missing]
+    token = jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+    with pytest.raises(JWTError):
+        verify_access_token(token)
+
+
+def test_wrong_signature_rejected():
+    token = create_access_token("alice")
+    forged = jwt.encode(jwt.decode(token, options={"verify_signature": False}),
+                        "other-secret-0123456789abcdef-0123456789", algorithm=JWT_ALGORITHM)
+
+    with pytest.raises(JWTError):
+        verify_access_token(forged)
+
+
+def test_garbage_token_is_treated_as_expired():
+    assert is_token_expired("not-a-token")
+    with pytest.raises(JWTError):
+        decode_token_payload("not-a-token")
+
+
+def test_unverified_payload_cache_does_not_keep_raw_token():
+    token = create_access_token("alice")
+    assert decode_token_payload(token)["sub"] == "alice"
+    assert not is_token_expired(token)
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in jwt_helper._unverified_cache)
+    assert token not in jwt_helper._unverified_cache
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from utils import save
+
+
+def test_atomic_write_replaces_target_and_leaves_no_temp_files(tmp_path):
+    target = tmp_path / "out.srt"
+    target.write_bytes(b"old")
+    save._atomic_write(target, b"new content")
+    assert target.read_bytes() == b"new content"
+    assert os.stat(target).st_mode & 0o777 == 0o644
+    assert os.listdir(tmp_path) == ["out.srt"]
+
+
+def test_atomic_write_removes_temp_file_on_failure(tmp_path, monkeypatch):
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(save.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        save._atomic_write(tmp_path / "out.srt", b"data")
+    assert os.listdir(tmp_path) == []
+
+
+def test_txt_keeps_stdlib_json_formatting(tmp_path):
+    data = {"text": "привет", "segments": [{"start": 0.1, "end": 2.0, "text": "привет"}]}
+    path = save._save_txt(data, tmp_path, "clip")
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def test_markdown_writes_markdown_and_html(tmp_path):
+    data = {"text": "hi", "segments": [{"start": 0.0, "end": 1.5, "text": "hi", "speaker": "A"}]}
+    md_path, html_path = save._save_markdown(data, tmp_path, "clip")
+    with open(md_path, encoding="utf-8") as f:
+        assert "hi" in f.read()
+    with open(html_path, encoding="utf-8") as f:
+        assert f.read().startswith("<!DOCTYPE html>")
+
+
+def test_failed_streamed_save_keeps_previous_file(tmp_path):
+    target = tmp_path / "clip_transcript.md"
+    target.write_text("previous transcript", encoding="utf-8")
+
+    def chunks():
+        yield "partial"
+        raise ValueError("bad segment")
+
+    with pytest.raises(ValueError):
+        save._write_chunks(target, chunks())
+    assert target.read_text(encoding="utf-8") == "previous transcript"
+    assert os.listdir(tmp_path) == ["clip_transcript.md"]
+
+
+def test_failed_markdown_save_keeps_previous_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "transcripts").mkdir()
+    existing = tmp_path / "transcripts" / "clip_transcript.md"
+    existing.write_text("previous transcript", encoding="utf-8")
+
+    data = {"segments": [{"start": 0.0, "end": 1.0, "text": "hi"}, "bad"]}
+    with pytest.raises(OSError):
+        save.save_transcript_to_file(data, "clip.mp3", "markdown")
+    assert existing.read_text(encoding="utf-8") == "previous transcript"
+    assert os.listdir(tmp_path / "transcripts") == ["clip_transcript.md"]
+
+
+def test_markdown_fast_path_failure_falls_back_without_touching_target(tmp_path):
+    target = tmp_path / "clip_transcript.md"
+    target.write_text("previous transcript", encoding="utf-8")
+    # Число вместо строки ломает быстрый путь; валидирующий приводит его к str
+    data = {"segments": [{"start": 0.0, "end": 1.0, "text": "hi"}, {"start": 1.0, "end": 2.0, "text": 42}]}
+    save._write_markdown(target, data)
+    content = target.read_text(encoding="utf-8")
+    assert "hi" in content and "42" in content
+    assert os.listdir(tmp_path) == ["clip_transcript.md"]
@@ -0,0 +1,136 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+import server
+
+
+class FakeConnection:
+    def __init__(self, bad_users=(), batch_fails=False):
+        self.bad_users = set(bad_users)
+        self.batch_fails = batch_fails
+        self.saved = []
+
+    async def executemany(self, query, rows):
+        if self.batch_fails or any(row[0] in self.bad_users for row in rows):
+            raise RuntimeError("batch failed")
+        self.saved.extend(rows)
+
+    async def execute(self, query, *row):
+        if row[0] in self.bad_users:
+            raise RuntimeError("row failed")
+        self.saved.append(row)
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(server, "get_db_pool", lambda: FakePool(conn))
+    return conn
+
+
+def _row(user_id):
+    return (user_id, f"file{user_id}.mp3", "text", "txt", None)
+
+
+def test_failed_batch_falls_back_to_single_rows(conn):
+    conn.bad_users = {2}
+    asyncio.run(server._write_transcriptions([_row(1), _row(2), _row(3)]))
+    assert [row[0] for row in conn.saved] == [1, 3]
+
+
+def test_writer_drains_queue_before_stopping(conn):
+    async def run():
+        queue = asyncio.Queue()
+        writer = asyncio.create_task(server._transcription_writer(queue))
+        for user_id in range(250):
+            queue.put_nowait(_row(user_id))
+        queue.put_nowait(None)
+        await asyncio.wait_for(writer, timeout=5)
+
+    asyncio.run(run())
+    assert [row[0] for row in conn.saved] == list(range(250))
+
+
+def test_running_task_survives_eviction_and_moves_to_storage_when_done(monkeypatch, conn, tmp_path):
+    async def fake_analysis(progress_cb, **kwargs):
+        # Заполняем хранилище готовых задач сверх лимита, пока задача выполняется
+        for n in range(server.TASKS_MAX + 10):
+            server.tasks_storage[f"done-{n}"] = {"status": "completed"}
+        progress_cb("processing", 50)
+        return "<html></html>"
+
+    monkeypatch.setattr(server, "generate_speaking_analysis", fake_analysis)
+    monkeypatch.setattr(server, "tasks_storage", server.TTLCache(maxsize=server.TASKS_MAX, ttl=server.TASKS_TTL))
+    upload = tmp_path / "upload.mp3"
+    upload.write_bytes(b"audio")
+    server._running_tasks["t1"] = {"status": "pending", "progress": 0, "created_at": None, "user_id": 1}
+
+    async def run():
+        await server.process_async_analysis("t1", str(upload), "a.mp3", "english", "", False, 1, 2, 1)
+        return await server.get_task("t1")
+
+    task = asyncio.run(run())
+    assert task["status"] == "completed"
+    assert "t1" not in server._running_tasks
+    assert not upload.exists()
+
+
+@pytest.mark.parametrize("scheme", ["Bearer", "bearer", "BEARER"])
+def test_auth_accepts_any_bearer_case(scheme):
+    token = server.create_access_token(data={"sub": "1", "id": 1})
+    assert asyncio.run(server.auth(f"{scheme} {token}"))["id"] == 1
+
+
+@pytest.mark.parametrize("header", [None, "", "Bearer", "Bearer ", "Basic abc", "Token abc"])
+def test_auth_rejects_missing_or_foreign_scheme(header):
+    with pytest.raises(server.HTTPException) as exc:
+        asyncio.run(server.auth(header))
+    assert exc.value.status_code == 401
+
+
+class BrokenPool:
+    def __init__(self, error):
+        self.error = error
+
+    @asynccontextmanager
+    async def acquire(self):
+        raise self.error
+        yield
+
+
+@pytest.mark.parametrize("error", [ConnectionError("db down"), ValueError("bad id")])
+def test_get_task_reports_db_errors_as_not_found(monkeypatch, error):
+    monkeypatch.setattr(server, "db_pool", BrokenPool(error))
+    assert asyncio.run(server.get_task("missing")) is None
+
+
+def _authenticate_as(monkeypatch, username, allowed):
+    monkeypatch.setattr(server.Config, "ALLOWED_USERNAMES", frozenset(allowed))
+    monkeypatch.setattr(server, "verify_telegram_webapp_data", lambda init_data: {"id": 7, "username": username})
+    return asyncio.run(server.authenticate(server.AuthRequest(initData="signed")))
+
+
+@pytest.mark.parametrize("username", ["alice", "Alice", "ALICE"])
+def test_authenticate_admits_allowlisted_user_in_any_case(monkeypatch, username):
+    assert _authenticate_as(monkeypatch, username, {"alice"}).user_id == 7
+
+
+def test_authenticate_rejects_user_outside_allowlist(monkeypatch):
+    with pytest.raises(server.HTTPException) as exc:
+        _authenticate_as(monkeypatch, "mallory", {"alice"})
+    assert exc.value.status_code == 403
+
+
+def test_authenticate_with_empty_allowlist_admits_everyone(monkeypatch):
+    assert _authenticate_as(monkeypatch, "anyone", set()).user_id == 7
@@ -0,0 +1,106 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import quote, urlencode
+
+import pytest
+
+from config import TELEGRAM_BOT_TOKEN
+from utils import telegram_auth
+from utils.telegram_auth import verify_telegram_init_data
+
+
+def make_init_data(fields, hash_value=None, quote_via=quote):
+    """Build initData signed the way Telegram does it."""
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    signature = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    params = dict(fields)
+    params["hash"] = signature if hash_value is None else hash_value
+    return urlencode(params, quote_via=quote_via)
+
+
+def user_fields(**user):
+    user.setdefault("id", 279058397)
+    return {
+        "auth_date": str(int(time.time())),
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": json.dumps(user, ensure_ascii=False),
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    telegram_auth._verified_cache.clear()
+    yield
+    telegram_auth._verified_cache.clear()
+
+
+def test_valid_init_data():
+    result = verify_telegram_init_data(make_init_data(user_fields(username="Alice", first_name="Влад ✓")))
+
+    assert result["username"] == "alice"
+    assert result["user_id"] == 279058397
+    assert result["user_data"]["first_name"] == "Влад ✓"
+
+
+def test_plus_encoded_values():
+    fields = user_fields(username="bob", last_name="K+B von Neumann")
+    fields["chat_instance"] = "-123 456"
+    init_data = make_init_data(fields, quote_via=lambda s, *args: quote(s, safe="").replace("%20", "+"))
+
+    assert verify_telegram_init_data(init_data)["username"] == "bob"
+
+
+def test_repeated_init_data_is_served_from_cache():
+    init_data = make_init_data(user_fields(username="alice"))
+    first = verify_telegram_init_data(init_data)
+    first["username"] = "mutated"
+
+    assert verify_telegram_init_data(init_data)["username"] == "alice"
+
+
+@pytest.mark.parametrize("hash_value", ["f" * 64, "zz" * 32, "ж" * 64, "abc", ""])
+def test_bad_hash_rejected(hash_value):
+    with pytest.raises(ValueError, match="Invalid initData signature"):
+        verify_telegram_init_data(make_init_data(user_fields(username="alice"), hash_value=hash_value))
+
+
+def test_missing_hash_rejected():
+    init_data = urlencode(user_fields(username="alice"))
+
+    with pytest.raises(ValueError, match="Invalid initData signature"):
+        verify_telegram_init_data(init_data)
+
+
+def test_tampered_field_rejected():
+    init_data = make_init_data(user_fields(username="alice"))
+
+    with pytest.raises(ValueError, match="Invalid initData signature"):
+        verify_telegram_init_data(init_data.replace("AAHdF6IQ", "BBHdF6IQ"))
+
+
+def test_expired_auth_date_rejected():
+    fields = user_fields(username="alice")
+    fields["auth_date"] = str(int(time.time()) - telegram_auth.MAX_AUTH_AGE - 60)
+
+    with pytest.raises(ValueError):
+        verify_telegram_init_data(make_init_data(fields))
+
+
+def test_username_required():
+    with pytest.raises(ValueError, match="User data validation failed"):
+        verify_telegram_init_data(make_init_data(user_fields(first_name="NoName")))
+
+
+
+def test_lone_surrogate_rejected_with_value_error():
+    with pytest.raises(ValueError, match="Invalid initData format"):
+        verify_telegram_init_data("user=\udcff&hash=" + "0" * 64)
+
+
+def test_escaped_username_key_accepted():
+    fields = user_fields()
+    fields["user"] = '{"id": 279058397, "\\u0075sername": "Alice"}'
+    assert verify_telegram_init_data(make_init_data(fields))["username"] == "alice"
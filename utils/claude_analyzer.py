@@ -1,40 +1,119 @@
 import aiohttp
+import orjson
 import asyncio
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
-from config import CLAUDE_API_KEY, CLAUDE_API_URL
+import re
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, List, Optional
+from config import CLAUDE_API_KEY, CLAUDE_API_URL, CLAUDE_CACHE_TTL
 from api.whisper import transcribe_audio
+from utils.claude_cache import AnalysisCache
 
 logger = logging.getLogger(__name__)
 
+# Optional: aiodns lets aiohttp resolve hostnames without the getaddrinfo thread pool
+try:
+    import aiodns  # noqa: F401
+    _HAS_AIODNS = True
+except ImportError:
+    _HAS_AIODNS = False
+
 
 class ClaudeAnalyzerError(Exception):
     """Custom exception for Claude analyzer errors."""
     pass
 
 
+# Reports for identical analysis requests (same transcript, filename, language, prompt)
+_analysis_cache = AnalysisCache(maxsize=512, ttl=CLAUDE_CACHE_TTL)
+
+# Concurrency and rate-limit handling for Claude API calls
+CLAUDE_MAX_CONCURRENCY = 8
+CLAUDE_MAX_RETRIES = 3
+CLAUDE_RETRY_BASE_DELAY = 2.0  # seconds, doubled on each attempt
+CLAUDE_RETRY_MAX_DELAY = 60.0  # seconds
+
+_claude_semaphore = asyncio.Semaphore(CLAUDE_MAX_CONCURRENCY)
+
+
+def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """
+    Seconds to wait before retrying a rate-limited request.
+
+    Args:
+        retry_after: Value of the Retry-After header, if any
+        attempt: Zero-based attempt number
+
+    Returns:
+        float: Delay in seconds, capped at CLAUDE_RETRY_MAX_DELAY
+    """
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = CLAUDE_RETRY_BASE_DELAY * (2 ** attempt)
+    return min(max(delay, 0.0), CLAUDE_RETRY_MAX_DELAY)
+
+
+# Shared HTTP session for Claude API calls (keep-alive pool, created on first use)
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """
+    Return the shared Claude API session, creating it on first use.
+
+    Returns:
+        aiohttp.ClientSession: Session with a keep-alive connection pool
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=180),
+            connector=aiohttp.TCPConnector(
+                limit=50, limit_per_host=50, keepalive_timeout=60,
+                resolver=aiohttp.AsyncResolver() if _HAS_AIODNS else None,
+                use_dns_cache=True, ttl_dns_cache=300, enable_cleanup_closed=True
+            )
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared Claude API session (call on application shutdown)."""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
 async def generate_speaking_analysis(
-        file_content: bytes,
-        filename: str,
+        file_content: Optional[bytes] = None,
+        filename: Optional[str] = None,
         language: str = "english",
         prompt: str = "",
         translate: bool = False,
         min_speakers: int = 1,
         max_speakers: int = 8,
+        file_path: Optional[str] = None,
+        progress_cb: Optional[Callable[[str, int], None]] = None,
+        transcript: Optional[str] = None,
         **kwargs
 ) -> str:
     """
     Generate HTML analysis report using Whisper + Claude API
 
     Args:
-        file_content: Audio file content as bytes
-        filename: Original audio filename
+        file_content: Audio file content as bytes (ignored if file_path is given)
+        filename: Original audio filename (defaults to the name of file_path)
         language: Language for transcription
         prompt: Additional context prompt
         translate: Whether to translate to English
         min_speakers: Minimum number of speakers
         max_speakers: Maximum number of speakers
+        file_path: Path to the audio file on disk (streamed instead of held in memory)
+        progress_cb: Optional callback called as progress_cb(stage, percent) at each milestone
+        transcript: Already transcribed text; when given, the Whisper step is skipped
 
     Returns:
         HTML string with complete analysis report
@@ -47,42 +126,54 @@ async def generate_speaking_analysis(
     if not CLAUDE_API_KEY:
         raise ClaudeAnalyzerError("Claude API key not configured. Please set CLAUDE_API_KEY environment variable.")
 
-    if not file_content:
+    if not file_content and file_path is None and transcript is None:
         raise ClaudeAnalyzerError("No audio file content provided")
 
-    try:
-        # Step 1: Transcribe audio with Whisper
-        logger.info(f"🎤 Starting transcription for: {filename}")
+    if filename is None and file_path is not None:
+        filename = Path(file_path).name
 
-        transcript_result = await transcribe_audio(
-            file_content=file_content,
-            filename=filename,
-            language=language,
-            translate=translate,
-            min_speakers=min_speakers,
-            max_speakers=max_speakers,
-            speaker_labels=True,
-            response_format="verbose_json"
-        )
-
-        # Extract transcript text and segments
-        if isinstance(transcript_result, dict):
-            transcript_text = transcript_result.get("text", "")
-            segments = transcript_result.get("segments", [])
+    try:
+        if transcript is not None:
+            # Transcript provided by the caller: go straight to Claude
+            formatted_transcript = transcript
         else:
-            transcript_text = str(transcript_result)
-            segments = []
-
-        if not transcript_text.strip():
-            raise ClaudeAnalyzerError("No transcript text was generated from the audio file")
-
-        logger.info(f"✅ Transcription completed: {len(transcript_text)} characters")
-
-        # Step 2: Format transcript with speaker labels
-        formatted_transcript = format_transcript_with_speakers(transcript_text, segments)
+            # Step 1: Transcribe audio with Whisper
+            logger.info("🎤 Starting transcription for: %s", filename)
+            if progress_cb:
+                progress_cb("transcribing", 20)
+
+            transcript_result = await transcribe_audio(
+                file_content=file_content,
+                file_path=file_path,
+                filename=filename,
+                language=language,
+                translate=translate,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers,
+                speaker_labels=True,
+                response_format="verbose_json"
+            )
+
+            # Extract transcript text and segments
+            if isinstance(transcript_result, dict):
+                transcript_text = transcript_result.get("text", "")
+                segments = transcript_result.get("segments", [])
+            else:
+                transcript_text = str(transcript_result)
+                segments = []
+
+            if not transcript_text.strip():
+                raise ClaudeAnalyzerError("No transcript text was generated from the audio file")
+
+            logger.info("✅ Transcription completed: %d characters", len(transcript_text))
+
+            # Step 2: Format transcript with speaker labels (off the event loop for long transcripts)
+            formatted_transcript = await asyncio.to_thread(format_transcript_with_speakers, transcript_text, segments)
 
         # Step 3: Generate analysis with Claude
-        logger.info(f"🧠 Starting Claude analysis for: {filename}")
+        logger.info("🧠 Starting Claude analysis for: %s", filename)
+        if progress_cb:
+            progress_cb("analyzing", 60)
         html_report = await analyze_transcript_with_claude(
             transcript=formatted_transcript,
             filename=filename,
@@ -90,14 +181,14 @@ async def generate_speaking_analysis(
             language=language
         )
 
-        logger.info(f"✅ Complete analysis finished for {filename}")
+        logger.info("✅ Complete analysis finished for %s", filename)
         return html_report
 
     except Exception as e:
         if isinstance(e, ClaudeAnalyzerError):
             raise
         else:
-            logger.error(f"❌ Analysis failed for {filename}: {str(e)}")
+            logger.error("❌ Analysis failed for %s: %s", filename, e)
             raise ClaudeAnalyzerError(f"Analysis failed: {str(e)}")
 
 
@@ -116,54 +207,21 @@ def format_transcript_with_speakers(transcript_text: str, segments: list) -> str
         return transcript_text
 
     formatted_lines = []
-
     for segment in segments:
-        speaker = segment.get('speaker', 'Speaker 1')
         text = segment.get('text', '').strip()
-        start_time = segment.get('start', 0)
-
-        if text:
-            # Format timestamp as MM:SS
-            minutes = int(start_time // 60)
-            seconds = int(start_time % 60)
-            timestamp = f"[{minutes:02d}:{seconds:02d}]"
-
-            formatted_lines.append(f"{speaker} {timestamp}: {text}")
+        if not text:
+            continue
+        # Timestamp formatted as [MM:SS]
+        minutes, seconds = divmod(int(segment.get('start', 0)), 60)
+        formatted_lines.append(f"{segment.get('speaker', 'Speaker 1')} [{minutes:02d}:{seconds:02d}]: {text}")
 
     return "\n".join(formatted_lines) if formatted_lines else transcript_text
 
 
-async def analyze_transcript_with_claude(
-        transcript: str,
-        filename: str,
-        custom_prompt: str = "",
-        language: str = "english"
-) -> str:
-    """
-    Send transcript to Claude for analysis.
-
-    Args:
-        transcript: Formatted transcript with speaker labels
-        filename: Original filename
-        custom_prompt: Additional analysis context
-        language: Original language of the audio
-
-    Returns:
-        HTML analysis report
-    """
-
-    # Build analysis prompt
-    base_prompt = f"""Analyze this speaking session transcript and create a comprehensive HTML report.
-
-TRANSCRIPT:
-{transcript}
+# Static parts of the analysis prompt (built once at import)
+_PROMPT_HEAD = "Analyze this speaking session transcript and create a comprehensive HTML report."
 
-CONTEXT:
-- Filename: {filename}
-- Original Language: {language}
-{f"- Additional Context: {custom_prompt}" if custom_prompt else ""}
-
-Create a complete HTML page with:
+_PROMPT_TAIL = """Create a complete HTML page with:
 1. **Executive Summary** - Key insights overview (2-3 sentences)
 2. **Speaker Analysis** - Individual speaking patterns, style, and statistics  
 3. **Communication Metrics** - Speaking time distribution, word count, pace analysis
@@ -184,6 +242,31 @@ Technical requirements:
 
 Return ONLY the complete HTML starting with <!DOCTYPE html>"""
 
+
+# Transcripts longer than this are summarized per segment before the final report
+MAX_TRANSCRIPT_CHARS = 60_000
+
+_CHUNK_PROMPT = """Summarize this segment of a speaking session transcript for a later report.
+Return ONLY a JSON object with:
+- "speakers": per speaker, approximate speaking time in seconds, word count and a short style note
+- "topics": main discussion points in this segment
+- "interaction": turn-taking and engagement observations
+- "notable_quotes": up to 3 short representative quotes with timestamps"""
+
+async def _stream_claude(content: list, max_tokens: int = 4000) -> AsyncIterator[str]:
+    """
+    Send one user message to Claude and stream back the generated text.
+
+    Args:
+        content: Message content blocks
+        max_tokens: Maximum number of tokens to generate
+
+    Yields:
+        str: Chunks of generated text, in order
+
+    Raises:
+        ClaudeAnalyzerError: If the API call fails
+    """
     headers = {
         "Content-Type": "application/json",
         "x-api-key": CLAUDE_API_KEY,
@@ -192,87 +275,280 @@ Return ONLY the complete HTML starting with <!DOCTYPE html>"""
 
     payload = {
         "model": "claude-3-5-sonnet-20241022",
-        "max_tokens": 4000,
+        "max_tokens": max_tokens,
         "temperature": 0.3,
+        "stream": True,
         "messages": [
             {
                 "role": "user",
-                "content": base_prompt
+                "content": content
             }
         ]
     }
 
-    # Timeout for large analyses
-    timeout = aiohttp.ClientTimeout(total=180)
+    # Serialized once with orjson (reused across 429 retries)
+    body = orjson.dumps(payload)
 
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(CLAUDE_API_URL, json=payload, headers=headers) as response:
-                if response.status == 200:
-                    result = await response.json()
-
-                    # Extract content from Claude response
-                    if "content" in result and len(result["content"]) > 0:
-                        html_content = result["content"][0]["text"]
-
-                        # Validate that we got HTML
-                        if not html_content.strip().startswith("<!DOCTYPE html"):
-                            logger.warning("Claude response doesn't appear to be valid HTML, wrapping...")
-                            html_content = wrap_in_html(html_content, filename)
-
-                        logger.info(f"✅ Claude analysis generated successfully for {filename}")
-                        logger.info(f"📄 Generated HTML length: {len(html_content)} characters")
-                        return html_content
-                    else:
-                        raise ClaudeAnalyzerError("Invalid response format from Claude API")
-
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ Claude API error {response.status}: {error_text}")
-
-                    # Handle specific error cases
-                    if response.status == 401:
-                        raise ClaudeAnalyzerError("Invalid Claude API key")
-                    elif response.status == 429:
-                        raise ClaudeAnalyzerError("Claude API rate limit exceeded - please try again in a few minutes")
-                    elif response.status >= 500:
-                        raise ClaudeAnalyzerError("Claude API server error - please try again later")
-                    else:
-                        raise ClaudeAnalyzerError(f"Claude API error {response.status}: {error_text}")
+        # Shared session (180s timeout for large analyses)
+        session = await _get_session()
+        # Bounded concurrency; 429s are retried after Retry-After (or exponential backoff)
+        async with _claude_semaphore:
+            for attempt in range(CLAUDE_MAX_RETRIES + 1):
+                async with session.post(CLAUDE_API_URL, data=body, headers=headers) as response:
+                    if response.status == 429 and attempt < CLAUDE_MAX_RETRIES:
+                        delay = _retry_delay(response.headers.get("Retry-After"), attempt)
+                        logger.warning("⏳ Claude API rate limited, retrying in %.1fs", delay)
+                        response.release()
+                        await asyncio.sleep(delay)
+                        continue
+
+                    if response.status != 200:
+                        error_text = await response.text()
+                        logger.error("❌ Claude API error %s: %s", response.status, error_text)
+
+                        # Handle specific error cases
+                        if response.status == 401:
+                            raise ClaudeAnalyzerError("Invalid Claude API key")
+                        elif response.status == 429:
+                            raise ClaudeAnalyzerError("Claude API rate limit exceeded - please try again in a few minutes")
+                        elif response.status >= 500:
+                            raise ClaudeAnalyzerError("Claude API server error - please try again later")
+                        else:
+                            raise ClaudeAnalyzerError(f"Claude API error {response.status}: {error_text}")
+
+                    # Server-sent events: only text deltas carry report content
+                    async for line in response.content:
+                        if not line.startswith(b"data:"):
+                            continue
+
+                        event = orjson.loads(line[5:])
+                        event_type = event.get("type")
+
+                        if event_type == "content_block_delta":
+                            text = event.get("delta", {}).get("text")
+                            if text:
+                                yield text
+                        elif event_type == "error":
+                            message = event.get("error", {}).get("message", "Unknown error")
+                            logger.error("❌ Claude API stream error: %s", message)
+                            raise ClaudeAnalyzerError(f"Claude API error: {message}")
+
+                    return
 
     except asyncio.TimeoutError:
         logger.error("❌ Claude API request timeout (3 minutes)")
         raise ClaudeAnalyzerError("Analysis timeout - please try with a shorter audio file or try again later")
     except aiohttp.ClientError as e:
-        logger.error(f"❌ Network error during Claude API call: {str(e)}")
+        logger.error("❌ Network error during Claude API call: %s", e)
         raise ClaudeAnalyzerError(f"Network error: {str(e)}")
     except ClaudeAnalyzerError:
         # Re-raise our custom errors as-is
         raise
     except Exception as e:
-        logger.error(f"❌ Unexpected error during Claude analysis: {str(e)}")
+        logger.error("❌ Unexpected error during Claude analysis: %s", e)
         raise ClaudeAnalyzerError(f"Analysis failed: {str(e)}")
 
 
-def wrap_in_html(content: str, filename: str) -> str:
+def _split_transcript(transcript: str, max_chars: int) -> List[str]:
     """
-    Wrap content in basic HTML structure if Claude doesn't return valid HTML.
+    Split a transcript into chunks of at most max_chars, on line (speaker turn) boundaries.
 
     Args:
-        content: The content to wrap
-        filename: Original filename for title
+        transcript: Formatted transcript
+        max_chars: Maximum chunk length
 
     Returns:
-        Complete HTML document
+        List of transcript chunks
+    """
+    chunks = []
+    current = []
+    size = 0
+
+    for line in transcript.split("\n"):
+        # A single oversized line is cut into pieces, after the lines buffered before it
+        if len(line) > max_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current = []
+                size = 0
+            while len(line) > max_chars:
+                chunks.append(line[:max_chars])
+                line = line[max_chars:]
+
+        if size + len(line) + 1 > max_chars and current:
+            chunks.append("\n".join(current))
+            current = []
+            size = 0
+
+        current.append(line)
+        size += len(line) + 1
+
+    if current:
+        chunks.append("\n".join(current))
+
+    return chunks
+
+
+async def _summarize_chunk(chunk: str, index: int, total: int, language: str) -> str:
     """
-    return f"""<!DOCTYPE html>
+    Summarize one transcript segment for the final report.
+
+    Args:
+        chunk: Transcript segment
+        index: Segment number (1-based)
+        total: Total number of segments
+        language: Original language of the audio
+
+    Returns:
+        JSON summary text produced by Claude
+    """
+    prompt = (
+        f"{_CHUNK_PROMPT}\n\nSEGMENT {index} of {total} (original language: {language}):\n{chunk}"
+    )
+    parts = [part async for part in _stream_claude([{"type": "text", "text": prompt}], max_tokens=1500)]
+    return "".join(parts)
+
+
+async def _condense_transcript(transcript: str, language: str) -> str:
+    """
+    Map-reduce a transcript that is too long for a single analysis request.
+
+    Each segment is summarized by its own Claude call (concurrently, bounded by the
+    shared semaphore); the final report is then generated from these summaries.
+
+    Args:
+        transcript: Formatted transcript longer than MAX_TRANSCRIPT_CHARS
+        language: Original language of the audio
+
+    Returns:
+        Condensed transcript made of per-segment summaries
+
+    Raises:
+        ClaudeAnalyzerError: If no segment could be summarized
+    """
+    chunks = _split_transcript(transcript, MAX_TRANSCRIPT_CHARS)
+    total = len(chunks)
+    logger.info("✂️ Transcript too long (%d characters), summarizing %d segments", len(transcript), total)
+
+    results = await asyncio.gather(
+        *(_summarize_chunk(chunk, n, total, language) for n, chunk in enumerate(chunks, 1)),
+        return_exceptions=True
+    )
+
+    summaries = []
+    failed = 0
+    for n, result in enumerate(results, 1):
+        if isinstance(result, BaseException):
+            logger.warning("⚠️ Summary for segment %d of %d failed: %s", n, total, result)
+            # Пропуск помечаем явно, чтобы отчёт не считал метрики по неполным данным молча
+            failed += 1
+            summaries.append(f"SEGMENT {n} of {total} SUMMARY:\n[MISSING - this segment could not be summarized]")
+            continue
+        summaries.append(f"SEGMENT {n} of {total} SUMMARY:\n{result}")
+
+    if failed == total:
+        raise ClaudeAnalyzerError("Transcript too long and no segment could be summarized")
+
+    return (
+        "The full transcript was too long to include; below are per-segment summaries "
+        "in chronological order. Base all metrics and charts on them; segments marked MISSING "
+        "are absent from the data, so note the gap instead of guessing their content.\n\n"
+        + "\n\n".join(summaries)
+    )
+
+
+async def stream_transcript_analysis(
+        transcript: str,
+        filename: str,
+        custom_prompt: str = "",
+        language: str = "english"
+) -> AsyncIterator[str]:
+    """
+    Stream Claude's analysis of a transcript as it is generated.
+
+    Args:
+        transcript: Formatted transcript with speaker labels
+        filename: Original filename
+        custom_prompt: Additional analysis context
+        language: Original language of the audio
+
+    Yields:
+        str: Chunks of the HTML report text, in order
+
+    Raises:
+        ClaudeAnalyzerError: If the API call fails
+    """
+
+    # Very long transcripts are condensed segment by segment first
+    if len(transcript) > MAX_TRANSCRIPT_CHARS:
+        transcript = await _condense_transcript(transcript, language)
+
+    # Build analysis prompt (only the transcript and context lines vary per call)
+    context_line = f"- Additional Context: {custom_prompt}" if custom_prompt else ""
+    base_prompt = (
+        f"{_PROMPT_HEAD}\n\nTRANSCRIPT:\n{transcript}\n\n"
+        f"CONTEXT:\n- Filename: {filename}\n- Original Language: {language}\n{context_line}\n\n"
+        f"{_PROMPT_TAIL}"
+    )
+
+    content = [{"type": "text", "text": base_prompt}]
+    async for chunk in _stream_claude(content):
+        yield chunk
+
+
+async def analyze_transcript_with_claude(
+        transcript: str,
+        filename: str,
+        custom_prompt: str = "",
+        language: str = "english"
+) -> str:
+    """
+    Send transcript to Claude for analysis.
+
+    Args:
+        transcript: Formatted transcript with speaker labels
+        filename: Original filename
+        custom_prompt: Additional analysis context
+        language: Original language of the audio
+
+    Returns:
+        HTML analysis report
+    """
+    cache_key = _analysis_cache.make_key(transcript, filename, language, custom_prompt)
+    cached = _analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.info("♻️ Using cached Claude analysis for %s", filename)
+        return cached
+
+    chunks = [
+        chunk async for chunk in stream_transcript_analysis(transcript, filename, custom_prompt, language)
+    ]
+    html_content = "".join(chunks)
+
+    if not html_content:
+        raise ClaudeAnalyzerError("Invalid response format from Claude API")
+
+    # Validate that we got HTML
+    if not html_content.strip().startswith("<!DOCTYPE html"):
+        logger.warning("Claude response doesn't appear to be valid HTML, wrapping...")
+        html_content = wrap_in_html(html_content, filename)
+
+    logger.info("✅ Claude analysis generated successfully for %s", filename)
+    logger.info("📄 Generated HTML length: %d characters", len(html_content))
+    _analysis_cache.set(cache_key, html_content)
+    return html_content
+
+
+# Fallback report page; plain sentinels instead of f-string placeholders (no {{ }} escaping)
+_FALLBACK_HTML_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Analysis Report - {filename}</title>
+    <title>Analysis Report - __FILENAME__</title>
     <style>
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
             line-height: 1.6;
             max-width: 1200px;
@@ -281,71 +557,71 @@ def wrap_in_html(content: str, filename: str) -> str:
             color: #333;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
-        }}
+        }
 
-        .container {{
+        .container {
             background: white;
             border-radius: 12px;
             padding: 30px;
             box-shadow: 0 10px 30px rgba(0,0,0,0.1);
             margin: 20px 0;
-        }}
+        }
 
-        .header {{
+        .header {
             text-align: center;
             border-bottom: 3px solid #667eea;
             padding-bottom: 20px;
             margin-bottom: 30px;
-        }}
+        }
 
-        .header h1 {{
+        .header h1 {
             color: #667eea;
             margin: 0;
             font-size: 2.5em;
-        }}
+        }
 
-        .content {{
+        .content {
             white-space: pre-wrap;
             background: #f8f9fa;
             padding: 25px;
             border-radius: 8px;
             border-left: 5px solid #667eea;
             font-size: 16px;
-        }}
+        }
 
-        .error-note {{
+        .error-note {
             background: #fff3cd;
             color: #856404;
             padding: 15px;
             border-radius: 6px;
             margin-bottom: 20px;
             border-left: 4px solid #ffc107;
-        }}
+        }
 
-        @media (max-width: 768px) {{
-            body {{ padding: 10px; }}
-            .container {{ padding: 20px; }}
-            .header h1 {{ font-size: 2em; }}
-        }}
+        @media (max-width: 768px) {
+            body { padding: 10px; }
+            .container { padding: 20px; }
+            .header h1 { font-size: 2em; }
+        }
 
-        @media print {{
-            body {{
+        @media print {
+            body {
                 background: white !important;
                 color: black !important;
-            }}
-            .container {{
+            }
+            .container {
                 box-shadow: none !important;
                 margin: 0 !important;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <div class="header">
             <h1>🧠 Analysis Report</h1>
-            <p>Generated by Claude AI for: <strong>{filename}</strong></p>
-            <p style="font-size: 14px; opacity: 0.7;">{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+            <p>Generated by Claude AI for: <strong>__FILENAME__</strong></p>
+            <p style="font-size: 14px; opacity: 0.7;">__TIMESTAMP__</p>
         </div>
 
         <div class="error-note">
@@ -354,12 +630,46 @@ def wrap_in_html(content: str, filename: str) -> str:
         </div>
 
         <div class="content">
-{content}
+__CONTENT__
         </div>
     </div>
 </body>
 </html>"""
 
+# Template split once at the sentinels: odd items are sentinel names, even items literal HTML.
+# Substituting the pieces (instead of chained str.replace) never re-scans inserted values.
+_FALLBACK_HTML_PARTS = re.split(r"(__FILENAME__|__TIMESTAMP__|__CONTENT__)", _FALLBACK_HTML_TEMPLATE)
+
+
+# Last formatted timestamp, reused within the same second
+_last_timestamp = (0, "")
+
+
+def _current_timestamp() -> str:
+    """Local time as 'YYYY-MM-DD HH:MM:SS', formatted at most once per second."""
+    global _last_timestamp
+    now = int(time.time())
+    if now != _last_timestamp[0]:
+        _last_timestamp = (now, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)))
+    return _last_timestamp[1]
+
+
+def wrap_in_html(content: str, filename: str) -> str:
+    """
+    Wrap content in basic HTML structure if Claude doesn't return valid HTML.
+
+    Args:
+        content: The content to wrap
+        filename: Original filename for title
+
+    Returns:
+        Complete HTML document
+    """
+    values = {"__FILENAME__": filename, "__TIMESTAMP__": _current_timestamp(), "__CONTENT__": content}
+    parts = _FALLBACK_HTML_PARTS.copy()
+    parts[1::2] = [values[name] for name in parts[1::2]]
+    return "".join(parts)
+
 
 async def test_claude_connection() -> bool:
     """
@@ -394,7 +704,7 @@ Speaker 1 [00:10]: Absolutely. Let's dive into the details and see what drove ou
             return False
 
     except Exception as e:
-        logger.error(f"❌ Claude API connection test failed: {e}")
+        logger.error("❌ Claude API connection test failed: %s", e)
         return False
 
 
@@ -431,7 +741,7 @@ async def generate_speaking_analysis_legacy(transcript: str, filename: str = "au
         HTML analysis report
     """
     logger.warning("Using legacy generate_speaking_analysis - transcript already provided")
-    return await analyze_transcript_with_claude(transcript, filename)
+    return await generate_speaking_analysis(transcript=transcript, filename=filename)
 
 
 if __name__ == "__main__":
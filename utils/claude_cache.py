@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+
+
+class AnalysisCache:
+    """
+    Bounded TTL cache for Claude analysis reports.
+
+    Entries are keyed by a BLAKE2b digest of everything that goes into the prompt
+    (transcript, filename, language and custom prompt), so an identical request
+    returns the stored report instead of calling Claude again. A TTL of 0 disables
+    caching.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: int = 86400):
+        self.enabled = ttl > 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl) if self.enabled else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(transcript: str, filename: str, language: str, custom_prompt: str) -> bytes:
+        """
+        Build the cache key for an analysis request.
+
+        Args:
+            transcript: Formatted transcript sent to Claude
+            filename: Original filename (appears in the prompt)
+            language: Original language of the audio
+            custom_prompt: Additional analysis context
+
+        Returns:
+            bytes: 16-byte BLAKE2b digest
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (language, custom_prompt, filename, transcript):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        """
+        Return the cached report for a key, if present.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            str or None: HTML report, or None on cache miss
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: bytes, html_report: str) -> None:
+        """
+        Store a generated report.
+
+        Args:
+            key: Key from make_key()
+            html_report: HTML report returned by Claude
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._cache[key] = html_report
+
+    def clear(self) -> None:
+        """Drop all cached reports (e.g. after a prompt change)."""
+        if self.enabled:
+            with self._lock:
+                self._cache.clear()
@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """
+    Bounded TTL cache for verified JWT payloads.
+
+    Entries are keyed by a 16-byte SHA-256 prefix of the token (never the raw token)
+    and are re-checked against the token's own ``exp`` claim on every hit, so an
+    expired token is never served from the cache. A TTL of 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 5):
+        self.enabled = ttl > 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl) if self.enabled else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()[:16]
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached payload for a token, if present and not expired.
+
+        Args:
+            token: Raw JWT token string
+
+        Returns:
+            dict or None: Verified payload, or None on cache miss
+        """
+        if not self.enabled:
+            return None
+
+        key = self._key(token)
+        with self._lock:
+            entry = self._cache.get(key)
+
+        if entry is None:
+            return None
+
+        payload, exp = entry
+        if exp <= time.time():
+            with self._lock:
+                self._cache.pop(key, None)
+            return None
+
+        return payload
+
+    def set(self, token: str, payload: Dict[str, Any]) -> None:
+        """
+        Store a successfully verified payload. Tokens without ``exp`` are not cached.
+
+        Args:
+            token: Raw JWT token string
+            payload: Verified token payload
+        """
+        if not self.enabled:
+            return
+
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+
+        with self._lock:
+            self._cache[self._key(token)] = (payload, exp)
+
+    def clear(self) -> None:
+        """Drop all cached entries (e.g. after secret rotation)."""
+        if self.enabled:
+            with self._lock:
+                self._cache.clear()
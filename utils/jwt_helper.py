@@ -1,8 +1,16 @@
+import base64
+import hashlib
+import json
 import logging
-from jose import jwt, JWTError
-from datetime import datetime, timedelta
+import threading
+import time
+import jwt
+from jwt import PyJWTError as JWTError
+from cachetools import LRUCache
+from types import MappingProxyType
 from typing import Optional, Dict, Any
-from config import JWT_SECRET_KEY, JWT_ALGORITHM, JWT_EXPIRES_MINUTES
+from config import JWT_SECRET as JWT_SECRET_KEY, JWT_ALGORITHM, JWT_EXPIRES_MINUTES, JWT_CACHE_TTL
+from utils.jwt_cache import TokenCache
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +18,24 @@ logger = logging.getLogger(__name__)
 JWT_ISSUER = "whisper-api"
 JWT_AUDIENCE = "whisper-api-users"
 
+# Claims identical in every access token, and the token lifetime in seconds
+_STATIC_CLAIMS = MappingProxyType({
+    "iss": JWT_ISSUER,  # Issuer
+    "aud": JWT_AUDIENCE,  # Audience
+    "type": "access"  # Token type
+})
+_EXPIRES_SECONDS = JWT_EXPIRES_MINUTES * 60
+
+# Claims every access token must carry; checked by PyJWT during decode
+_DECODE_OPTIONS = {"require": ["exp", "iat", "sub", "iss", "aud"]}
+
+# Verified payloads, so a token presented repeatedly is decoded once per JWT_CACHE_TTL
+_token_cache = TokenCache(maxsize=4096, ttl=JWT_CACHE_TTL)
+
+# Unverified payloads for inspection helpers; keyed by a SHA-256 prefix, never the raw token
+_unverified_cache = LRUCache(maxsize=2048)
+_unverified_cache_lock = threading.Lock()
+
 
 def create_access_token(username: str, additional_claims: Optional[Dict[str, Any]] = None) -> str:
     """
@@ -33,16 +59,14 @@ def create_access_token(username: str, additional_claims: Optional[Dict[str, Any
     if not username:
         raise ValueError("Username cannot be empty or whitespace")
 
-    now = datetime.utcnow()
-    expire = now + timedelta(minutes=JWT_EXPIRES_MINUTES)
+    # Integer epoch seconds: no datetime objects on the token path
+    now = int(time.time())
 
     payload = {
+        **_STATIC_CLAIMS,
         "sub": username,  # Subject (username)
-        "exp": expire,  # Expiration time
         "iat": now,  # Issued at
-        "iss": JWT_ISSUER,  # Issuer
-        "aud": JWT_AUDIENCE,  # Audience
-        "type": "access"  # Token type
+        "exp": now + _EXPIRES_SECONDS  # Expiration time
     }
 
     # Add any additional claims
@@ -79,19 +103,22 @@ def verify_access_token(token: str) -> str:
     if not token:
         raise ValueError("Token cannot be empty")
 
+    cached = _token_cache.get(token)
+    if cached is not None:
+        return cached["sub"]
+
     try:
         payload = jwt.decode(
             token,
             JWT_SECRET_KEY,
             algorithms=[JWT_ALGORITHM],
             audience=JWT_AUDIENCE,
-            issuer=JWT_ISSUER
+            issuer=JWT_ISSUER,
+            options=_DECODE_OPTIONS
         )
 
-        username = payload.get("sub")
-        if not username:
-            logger.warning("Token missing 'sub' claim")
-            raise JWTError("Invalid token: missing username")
+        # Presence of "sub" is enforced by PyJWT via the require option
+        username = payload["sub"]
 
         # Verify token type if present
         token_type = payload.get("type")
@@ -100,6 +127,7 @@ def verify_access_token(token: str) -> str:
             raise JWTError("Invalid token type")
 
         logger.debug(f"Token verified for user: {username}")
+        _token_cache.set(token, payload)
         return username
 
     except jwt.ExpiredSignatureError:
@@ -108,11 +136,43 @@ def verify_access_token(token: str) -> str:
     except jwt.InvalidTokenError as e:
         logger.warning(f"Invalid token: {e}")
         raise JWTError(f"Invalid token: {str(e)}")
+    except JWTError:
+        raise
     except Exception as e:
         logger.error(f"Token verification failed: {e}")
         raise JWTError(f"Token verification failed: {str(e)}")
 
 
+def clear_token_cache() -> None:
+    """Forget all cached verifications (call after rotating the signing key)."""
+    _token_cache.clear()
+    with _unverified_cache_lock:
+        _unverified_cache.clear()
+
+
+def _decode_unverified(token: str) -> Dict[str, Any]:
+    """
+    Base64url-decode and parse the payload segment of a JWT, once per token.
+
+    The result is shared between calls and must not be mutated.
+    """
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _unverified_cache_lock:
+        payload = _unverified_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload_segment = token.split(".")[1]
+    padded = payload_segment + "=" * (-len(payload_segment) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded))
+    if not isinstance(payload, dict):
+        raise ValueError("Token payload is not a JSON object")
+
+    with _unverified_cache_lock:
+        _unverified_cache[key] = payload
+    return payload
+
+
 def decode_token_payload(token: str) -> Dict[str, Any]:
     """
     Decode JWT token without verification (for debugging/inspection).
@@ -130,9 +190,8 @@ def decode_token_payload(token: str) -> Dict[str, Any]:
         raise ValueError("Token cannot be empty")
 
     try:
-        # Decode without verification for inspection
-        payload = jwt.get_unverified_claims(token)
-        return payload
+        # Decode without verification for inspection (copy: the parsed payload is cached)
+        return dict(_decode_unverified(token))
     except Exception as e:
         logger.error(f"Failed to decode token payload: {e}")
         raise JWTError(f"Cannot decode token: {str(e)}")
@@ -149,12 +208,10 @@ def is_token_expired(token: str) -> bool:
         bool: True if expired, False otherwise
     """
     try:
-        payload = decode_token_payload(token)
-        exp = payload.get("exp")
+        exp = _decode_unverified(token).get("exp")
         if not exp:
             return True
 
-        exp_datetime = datetime.utcfromtimestamp(exp)
-        return datetime.utcnow() > exp_datetime
-    except:
-        return True  # Assume expired if we can't decode
\ No newline at end of file
+        return time.time() > int(exp)
+    except Exception:
+        return True  # Assume expired if we can't decode
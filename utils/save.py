@@ -1,12 +1,51 @@
 import os
 import json
-import html
 import logging
-from typing import Dict, List, Any, Union, Tuple
+import tempfile
+from typing import Dict, Any, Union, Tuple, Iterable, Iterator
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Статичные части HTML-документа - собираются один раз при импорте
+_HTML_PREAMBLE = """<!DOCTYPE html>
+<html lang='en'>
+<head>
+  <meta charset='UTF-8'>
+  <meta name='viewport' content='width=device-width, initial-scale=1.0'>
+  <title>Transcript</title>
+  <style>
+    body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; padding: 2em; max-width: 800px; margin: auto; background: #fdfdfd; color: #333; }
+    h2 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 0.5em; }
+    .segment { margin-bottom: 1.5em; padding: 1em; background: #f8f9fa; border-left: 4px solid #3498db; border-radius: 4px; }
+    .speaker { font-weight: bold; color: #2c3e50; margin-bottom: 0.5em; }
+    .timestamp { color: #7f8c8d; font-size: 0.9em; font-weight: normal; }
+    .text { color: #34495e; line-height: 1.5; }
+  </style>
+</head>
+<body>
+<h2>Transcript</h2>
+"""
+_HTML_POSTAMBLE = "</body></html>"
+
+# Таблица экранирования HTML (как html.escape с quote=True) - один проход str.translate
+_HTML_ESCAPE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
+# Сколько сегментов HTML-форматтер собирает и экранирует за один шаг
+HTML_BATCH_SIZE = 256
+
+# Буфер потоковой записи транскриптов на диск
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Разделитель между репликами в Markdown
+_MD_SEPARATOR = "\n\n"
+
 
 def validate_transcript_data(data: Any) -> Dict[str, Any]:
     """
@@ -31,12 +70,125 @@ def validate_transcript_data(data: Any) -> Dict[str, Any]:
     return data
 
 
-def format_verbose_json_to_markdown(data: Dict[str, Any]) -> str:
+def _iter_markdown(data: Dict[str, Any], _validated: bool = False) -> Iterator[str]:
+    """
+    Yield Markdown chunks for a transcript, one segment at a time.
+
+    Args:
+        data: Transcript data with segments
+        _validated: Skip the schema check when the caller already ran
+            validate_transcript_data on this data
+
+    Yields:
+        str: Markdown pieces that concatenate into the full document
+
+    Raises:
+        ValueError: If data structure is invalid
+    """
+    validated_data = data if _validated else validate_transcript_data(data)
+    segments = validated_data.get("segments", [])
+
+    if not segments:
+        yield "⚠️ No segments found in transcription."
+        return
+
+    written = False
+    for i, segment in enumerate(segments):
+        try:
+            start = float(segment.get("start", 0))
+            end = float(segment.get("end", 0))
+            speaker = str(segment.get("speaker", f"Speaker {i + 1}")).strip()
+            text = str(segment.get("text", "")).strip()
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Skipping invalid segment {i}: {e}")
+            continue
+
+        if not text:
+            continue
+
+        # Escape Markdown special characters in text
+        text_escaped = text.replace("*", "\\*").replace("_", "\\_")
+
+        if written:
+            yield _MD_SEPARATOR
+        yield f"**{speaker}** [{start:.2f}s - {end:.2f}s]: {text_escaped}"
+        written = True
+
+    if not written:
+        yield "⚠️ No valid segments found in transcription."
+
+
+def _iter_markdown_fast(data: Dict[str, Any], _validated: bool = False) -> Iterator[str]:
+    """
+    Fast path of _iter_markdown for well-formed Whisper output.
+
+    The schema is validated once; segments are then read directly, without a
+    per-segment try/except or float()/str() coercion. Malformed segments surface
+    as KeyError/TypeError/ValueError/AttributeError so the caller can fall back
+    to the validating path.
+
+    Args:
+        data: Transcript data with segments
+        _validated: Skip the schema check when the caller already ran
+            validate_transcript_data on this data
+
+    Yields:
+        str: Markdown pieces that concatenate into the full document
+    """
+    validated_data = data if _validated else validate_transcript_data(data)
+    segments = validated_data.get("segments", [])
+
+    if not segments:
+        yield "⚠️ No segments found in transcription."
+        return
+
+    written = False
+    for i, segment in enumerate(segments):
+        text = segment["text"].strip()
+        if not text:
+            continue
+
+        speaker = segment.get("speaker", f"Speaker {i + 1}").strip()
+        text_escaped = text.replace("*", "\\*").replace("_", "\\_")
+
+        if written:
+            yield _MD_SEPARATOR
+        yield f"**{speaker}** [{segment['start']:.2f}s - {segment['end']:.2f}s]: {text_escaped}"
+        written = True
+
+    if not written:
+        yield "⚠️ No valid segments found in transcription."
+
+
+# Ошибки, по которым быстрый путь откатывается на валидирующий
+_FAST_PATH_ERRORS = (KeyError, TypeError, ValueError, AttributeError)
+
+
+def _write_markdown(path: Path, data: Dict[str, Any], _validated: bool = False) -> None:
+    """
+    Write the Markdown transcript, trying the fast path first.
+
+    Args:
+        path: Destination file
+        data: Transcript data with segments
+        _validated: Skip the schema check when the caller already ran
+            validate_transcript_data on this data
+    """
+    try:
+        _write_chunks(path, _iter_markdown_fast(data, _validated))
+    except _FAST_PATH_ERRORS:
+        # Быстрый путь не тронул целевой файл (только свой temp) - пишем заново с проверками
+        _write_chunks(path, _iter_markdown(data, _validated))
+
+
+def format_verbose_json_to_markdown(data: Dict[str, Any], fast: bool = True) -> str:
     """
     Convert verbose_json result to Markdown format.
 
     Args:
         data: Transcript data with segments
+        fast: Try the non-validating fast path first, falling back to the
+            per-segment validating formatter if the data is malformed
 
     Returns:
         str: Formatted Markdown content
@@ -45,45 +197,81 @@ def format_verbose_json_to_markdown(data: Dict[str, Any]) -> str:
         ValueError: If data structure is invalid
     """
     try:
-        validated_data = validate_transcript_data(data)
-        segments = validated_data.get("segments", [])
+        if fast:
+            try:
+                return "".join(_iter_markdown_fast(data))
+            except _FAST_PATH_ERRORS:
+                pass
+        return "".join(_iter_markdown(data))
 
-        if not segments:
-            return "⚠️ No segments found in transcription."
+    except Exception as e:
+        logger.error(f"Failed to format markdown: {e}")
+        raise ValueError(f"Markdown formatting failed: {str(e)}")
 
-        output = []
-        for i, segment in enumerate(segments):
-            try:
-                start = float(segment.get("start", 0))
-                end = float(segment.get("end", 0))
-                speaker = str(segment.get("speaker", f"Speaker {i + 1}")).strip()
-                text = str(segment.get("text", "")).strip()
 
-                if not text:
-                    continue
+def _iter_html(data: Dict[str, Any], _validated: bool = False) -> Iterator[str]:
+    """
+    Yield HTML chunks for a transcript, one batch of segments at a time.
 
-                # Format timestamp
-                start_time = f"{start:.2f}s"
-                end_time = f"{end:.2f}s"
+    Args:
+        data: Transcript data with segments
+        _validated: Skip the schema check when the caller already ran
+            validate_transcript_data on this data
 
-                # Escape Markdown special characters in text
-                text_escaped = text.replace("*", "\\*").replace("_", "\\_")
+    Yields:
+        str: HTML pieces that concatenate into the full document
+
+    Raises:
+        ValueError: If data structure is invalid
+    """
+    validated_data = data if _validated else validate_transcript_data(data)
+    segments = validated_data.get("segments", [])
 
-                line = f"**{speaker}** [{start_time} - {end_time}]: {text_escaped}"
-                output.append(line)
+    if not segments:
+        yield "<p>⚠️ No segments found in transcription.</p>"
+        return
 
+    yield _HTML_PREAMBLE
+
+    # Сегменты обрабатываются пачками: поля раскладываются по колонкам,
+    # экранируются одним списковым выражением и пачка уходит одной строкой
+    for batch_start in range(0, len(segments), HTML_BATCH_SIZE):
+        batch = segments[batch_start:batch_start + HTML_BATCH_SIZE]
+        speakers, starts, texts = [], [], []
+
+        for i, segment in enumerate(batch, batch_start):
+            try:
+                speaker = str(segment.get("speaker", f"Speaker {i + 1}")).strip()
+                start = float(segment.get("start", 0))
+                text = str(segment.get("text", "")).strip()
             except (ValueError, TypeError) as e:
                 logger.warning(f"Skipping invalid segment {i}: {e}")
                 continue
 
-        if not output:
-            return "⚠️ No valid segments found in transcription."
+            if not text:
+                continue
 
-        return "\n\n".join(output)
+            speakers.append(speaker)
+            starts.append(start)
+            texts.append(text)
 
-    except Exception as e:
-        logger.error(f"Failed to format markdown: {e}")
-        raise ValueError(f"Markdown formatting failed: {str(e)}")
+        if not texts:
+            continue
+
+        # Escape HTML in all user content
+        speakers = [speaker.translate(_HTML_ESCAPE) for speaker in speakers]
+        texts = [text.translate(_HTML_ESCAPE) for text in texts]
+
+        # Timestamp as MM:SS
+        yield "".join(
+            f'<div class="segment">\n'
+            f'  <div class="speaker">{speaker} <span class="timestamp">({int(start // 60):02d}:{int(start % 60):02d})</span></div>\n'
+            f'  <div class="text">{text}</div>\n'
+            f'</div>\n'
+            for speaker, start, text in zip(speakers, starts, texts)
+        )
+
+    yield _HTML_POSTAMBLE
 
 
 def format_verbose_json_to_html(data: Dict[str, Any]) -> str:
@@ -100,66 +288,146 @@ def format_verbose_json_to_html(data: Dict[str, Any]) -> str:
         ValueError: If data structure is invalid
     """
     try:
-        validated_data = validate_transcript_data(data)
-        segments = validated_data.get("segments", [])
-
-        if not segments:
-            return "<p>⚠️ No segments found in transcription.</p>"
-
-        html_lines = [
-            "<!DOCTYPE html>",
-            "<html lang='en'>",
-            "<head>",
-            "  <meta charset='UTF-8'>",
-            "  <meta name='viewport' content='width=device-width, initial-scale=1.0'>",
-            "  <title>Transcript</title>",
-            "  <style>",
-            "    body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; padding: 2em; max-width: 800px; margin: auto; background: #fdfdfd; color: #333; }",
-            "    h2 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 0.5em; }",
-            "    .segment { margin-bottom: 1.5em; padding: 1em; background: #f8f9fa; border-left: 4px solid #3498db; border-radius: 4px; }",
-            "    .speaker { font-weight: bold; color: #2c3e50; margin-bottom: 0.5em; }",
-            "    .timestamp { color: #7f8c8d; font-size: 0.9em; font-weight: normal; }",
-            "    .text { color: #34495e; line-height: 1.5; }",
-            "  </style>",
-            "</head>",
-            "<body>",
-            "<h2>Transcript</h2>"
-        ]
-
-        for i, segment in enumerate(segments):
-            try:
-                speaker = str(segment.get("speaker", f"Speaker {i + 1}")).strip()
-                start = float(segment.get("start", 0))
-                text = str(segment.get("text", "")).strip()
+        return "".join(_iter_html(data))
 
-                if not text:
-                    continue
+    except Exception as e:
+        logger.error(f"Failed to format HTML: {e}")
+        raise ValueError(f"HTML formatting failed: {str(e)}")
 
-                # Format timestamp as MM:SS
-                minutes = int(start // 60)
-                seconds = int(start % 60)
-                timestamp = f"{minutes:02d}:{seconds:02d}"
 
-                # Escape HTML in all user content
-                speaker_escaped = html.escape(speaker)
-                text_escaped = html.escape(text)
+def _mkstemp_sibling(path: Path) -> Tuple[int, str]:
+    """
+    Create a uniquely named temp file next to path, with the usual 0644 mode.
 
-                html_lines.append('<div class="segment">')
-                html_lines.append(
-                    f'  <div class="speaker">{speaker_escaped} <span class="timestamp">({timestamp})</span></div>')
-                html_lines.append(f'  <div class="text">{text_escaped}</div>')
-                html_lines.append('</div>')
+    Args:
+        path: Final destination file
 
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Skipping invalid segment {i}: {e}")
+    Returns:
+        tuple: Open file descriptor and temp file name
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp создаёт файл с 0600 - оставляем прежние права 0644
+        os.fchmod(fd, 0o644)
+    except BaseException:
+        os.close(fd)
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return fd, tmp_name
+
+
+def _write_chunks(path: Path, chunks: Iterable[str]) -> None:
+    """
+    Stream formatted chunks to a UTF-8 text file.
+
+    Chunks go to a temp file in the same directory that replaces the target
+    only once the whole document is written, like _atomic_write; an existing
+    file is left untouched if the producer fails.
+
+    Args:
+        path: Destination file
+        chunks: Pieces of the document, written as they are produced
+
+    Raises:
+        Exception: Whatever the chunk producer raises; the temp file is removed
+    """
+    fd, tmp_name = _mkstemp_sibling(path)
+    try:
+        with open(fd, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(chunks)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """
+    Write a fully prepared document with raw os.open/os.write calls.
+
+    The bytes go to a uniquely named temp file in the same directory, which
+    replaces the target only once everything is written, so readers never see
+    a half-written transcript and concurrent saves never share a temp file.
+
+    Args:
+        path: Destination file
+        data: Encoded file content
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    fd, tmp_name = _mkstemp_sibling(path)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            os.close(fd)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def seconds_to_srt_time(seconds: float) -> str:
+    """
+    Convert seconds to SRT time format (HH:MM:SS,mmm).
+
+    Args:
+        seconds: Offset from the start of the audio
+
+    Returns:
+        str: SRT timestamp
+    """
+    # Целочисленный divmod по миллисекундам вместо серии float // и %
+    hours, rem = divmod(int(seconds * 1000), 3_600_000)
+    minutes, rem = divmod(rem, 60_000)
+    secs, millis = divmod(rem, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def _iter_srt(data: Dict[str, Any], _validated: bool = False) -> Iterator[str]:
+    """
+    Yield SRT subtitle blocks for a transcript, one segment at a time.
+
+    Args:
+        data: Transcript data with segments
+        _validated: Skip the schema check when the caller already ran
+            validate_transcript_data on this data
+
+    Yields:
+        str: SRT pieces that concatenate into the full subtitle file
+
+    Raises:
+        ValueError: If data structure is invalid
+    """
+    validated_data = data if _validated else validate_transcript_data(data)
+    segments = validated_data.get("segments", [])
+
+    written = False
+    for i, segment in enumerate(segments, 1):
+        try:
+            start = float(segment.get("start", 0))
+            end = float(segment.get("end", 0))
+            text = str(segment.get("text", "")).strip()
+
+            if not text:
                 continue
 
-        html_lines.append("</body></html>")
-        return "\n".join(html_lines)
+            start_time = seconds_to_srt_time(start)
+            end_time = seconds_to_srt_time(end)
 
-    except Exception as e:
-        logger.error(f"Failed to format HTML: {e}")
-        raise ValueError(f"HTML formatting failed: {str(e)}")
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Skipping invalid segment {i}: {e}")
+            continue
+
+        # Empty line between subtitles
+        if written:
+            yield "\n"
+        yield f"{i}\n{start_time} --> {end_time}\n{text}\n"
+        written = True
 
 
 def format_to_srt(data: Dict[str, Any]) -> str:
@@ -173,47 +441,76 @@ def format_to_srt(data: Dict[str, Any]) -> str:
         str: SRT formatted content
     """
     try:
-        validated_data = validate_transcript_data(data)
-        segments = validated_data.get("segments", [])
+        return "".join(_iter_srt(data))
 
-        if not segments:
-            return ""
+    except Exception as e:
+        logger.error(f"Failed to format SRT: {e}")
+        raise ValueError(f"SRT formatting failed: {str(e)}")
 
-        srt_lines = []
-        for i, segment in enumerate(segments, 1):
-            try:
-                start = float(segment.get("start", 0))
-                end = float(segment.get("end", 0))
-                text = str(segment.get("text", "")).strip()
 
-                if not text:
-                    continue
+def _save_markdown(data: Union[Dict[str, Any], str], output_dir: Path, base_name: str) -> Tuple[str, str]:
+    """Save Markdown plus its HTML companion; requires dictionary data."""
+    if not isinstance(data, dict):
+        raise ValueError("Dictionary required for markdown format")
 
-                # Convert seconds to SRT time format (HH:MM:SS,mmm)
-                def seconds_to_srt_time(seconds):
-                    hours = int(seconds // 3600)
-                    minutes = int((seconds % 3600) // 60)
-                    secs = int(seconds % 60)
-                    millis = int((seconds % 1) * 1000)
-                    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+    # Структуру проверяем один раз - форматтеры получают _validated=True
+    validate_transcript_data(data)
 
-                start_time = seconds_to_srt_time(start)
-                end_time = seconds_to_srt_time(end)
+    md_path = output_dir / f"{base_name}_transcript.md"
+    html_path = output_dir / f"{base_name}_transcript.html"
 
-                srt_lines.append(str(i))
-                srt_lines.append(f"{start_time} --> {end_time}")
-                srt_lines.append(text)
-                srt_lines.append("")  # Empty line between subtitles
+    # Stream both documents straight to disk
+    _write_markdown(md_path, data, _validated=True)
+    _write_chunks(html_path, _iter_html(data, _validated=True))
 
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Skipping invalid segment {i}: {e}")
-                continue
+    logger.info(f"Saved markdown to: {md_path}")
+    logger.info(f"Saved HTML to: {html_path}")
+    return str(md_path), str(html_path)
 
-        return "\n".join(srt_lines)
 
-    except Exception as e:
-        logger.error(f"Failed to format SRT: {e}")
-        raise ValueError(f"SRT formatting failed: {str(e)}")
+def _save_srt(data: Union[Dict[str, Any], str], output_dir: Path, base_name: str) -> str:
+    """Save SRT subtitles; string data is written as-is."""
+    srt_path = output_dir / f"{base_name}_transcript.srt"
+    if isinstance(data, dict):
+        validate_transcript_data(data)
+        _write_chunks(srt_path, _iter_srt(data, _validated=True))
+    else:
+        _atomic_write(srt_path, str(data).encode("utf-8"))
+
+    logger.info(f"Saved SRT to: {srt_path}")
+    return str(srt_path)
+
+
+def _save_html(data: Union[Dict[str, Any], str], output_dir: Path, base_name: str) -> str:
+    """Save an HTML transcript; string data is written as-is."""
+    html_path = output_dir / f"{base_name}_transcript.html"
+    if isinstance(data, dict):
+        validate_transcript_data(data)
+        _write_chunks(html_path, _iter_html(data, _validated=True))
+    else:
+        _atomic_write(html_path, str(data).encode("utf-8"))
+
+    logger.info(f"Saved HTML to: {html_path}")
+    return str(html_path)
+
+
+def _save_txt(data: Union[Dict[str, Any], str], output_dir: Path, base_name: str) -> str:
+    """Save raw transcript data: dictionaries as indented JSON, strings as-is."""
+    txt_path = output_dir / f"{base_name}_transcript.txt"
+    content = json.dumps(data, indent=2, ensure_ascii=False) if isinstance(data, dict) else str(data)
+    _atomic_write(txt_path, content.encode("utf-8"))
+
+    logger.info(f"Saved TXT to: {txt_path}")
+    return str(txt_path)
+
+
+# Обработчик на каждый поддерживаемый формат вывода
+_SAVE_HANDLERS = {
+    "markdown": _save_markdown,
+    "html": _save_html,
+    "srt": _save_srt,
+    "txt": _save_txt,
+}
 
 
 def save_transcript_to_file(
@@ -239,7 +536,8 @@ def save_transcript_to_file(
     if not source_file:
         raise ValueError("Source file path cannot be empty")
 
-    if output_format not in ['markdown', 'html', 'srt', 'txt']:
+    handler = _SAVE_HANDLERS.get(output_format)
+    if handler is None:
         raise ValueError(f"Unsupported output format: {output_format}")
 
     try:
@@ -248,50 +546,7 @@ def save_transcript_to_file(
         output_dir = Path("transcripts")
         output_dir.mkdir(exist_ok=True)
 
-        if output_format == "markdown":
-            if not isinstance(data, dict):
-                raise ValueError("Dictionary required for markdown format")
-
-            md_content = format_verbose_json_to_markdown(data)
-            html_content = format_verbose_json_to_html(data)
-
-            md_path = output_dir / f"{base_name}_transcript.md"
-            html_path = output_dir / f"{base_name}_transcript.html"
-
-            # Write files with proper error handling
-            md_path.write_text(md_content, encoding="utf-8")
-            html_path.write_text(html_content, encoding="utf-8")
-
-            logger.info(f"Saved markdown to: {md_path}")
-            logger.info(f"Saved HTML to: {html_path}")
-            return str(md_path), str(html_path)
-
-        elif output_format == "srt":
-            if isinstance(data, dict):
-                content = format_to_srt(data)
-            else:
-                content = str(data)
-            ext = ".srt"
-
-        elif output_format == "html":
-            if isinstance(data, dict):
-                content = format_verbose_json_to_html(data)
-            else:
-                content = str(data)
-            ext = ".html"
-
-        else:  # txt format
-            if isinstance(data, dict):
-                content = json.dumps(data, indent=2, ensure_ascii=False)
-            else:
-                content = str(data)
-            ext = ".txt"
-
-        output_path = output_dir / f"{base_name}_transcript{ext}"
-        output_path.write_text(content, encoding="utf-8")
-
-        logger.info(f"Saved {output_format.upper()} to: {output_path}")
-        return str(output_path)
+        return handler(data, output_dir, base_name)
 
     except Exception as e:
         logger.error(f"Failed to save transcript: {e}")
@@ -1,22 +1,135 @@
+import binascii
 import hmac
 import hashlib
 import logging
 import os
 import json
+import threading
 import time
-from urllib.parse import parse_qsl
-from config import BOT_TOKEN, ENV
+from typing import List, Optional, Tuple
+from urllib.parse import unquote_to_bytes
+from cachetools import TTLCache
+from config import TELEGRAM_BOT_TOKEN as BOT_TOKEN, ENV
 
 logger = logging.getLogger(__name__)
 
+# Optional: orjson parses the small user JSON blob several times faster than stdlib json.
+# orjson.JSONDecodeError наследуется от json.JSONDecodeError, обработка ошибок та же
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 # Максимальный возраст данных от Telegram (в секундах)
 MAX_AUTH_AGE = 24 * 60 * 60  # 24 часа
 
+# Сообщения ошибок проверки initData - общие строковые константы модуля
+_ERR_CONFIG = "Server configuration error"
+_ERR_FORMAT = "Invalid initData format"
+_ERR_SIGNATURE = "Invalid initData signature"
+_ERR_EXPIRED = "Authentication data expired"
+_ERR_AUTH_DATE = "Invalid auth_date"
+_ERR_HASH_CALC = "Hash calculation failed"
+_ERR_USER_ID = "Invalid user_id"
+_ERR_USERNAME = "Username required"
+_ERR_USER_FORMAT = "Invalid user data format"
+_ERR_USER_DATA = "User data validation failed"
+
+# Длина hex-представления SHA-256 и заглушка для initData без hash
+HASH_HEX_LENGTH = 64
+_DUMMY_HASH = b"0" * HASH_HEX_LENGTH
+
+# Кэш успешно проверенных initData (ключ - SHA-256 от строки)
+INIT_DATA_CACHE_TTL = 10 * 60  # 10 минут
+_verified_cache = TTLCache(maxsize=2048, ttl=INIT_DATA_CACHE_TTL)
+_verified_cache_lock = threading.Lock()
+
+
+def _derive_secret_key(bot_token: Optional[str]) -> Optional[bytes]:
+    """Derive the WebApp secret key: HMAC-SHA256 of the bot token keyed with "WebAppData"."""
+    if not bot_token:
+        return None
+    return hmac.digest(b"WebAppData", bot_token.encode(), "sha256")
+
+
+def _make_hmac_template(secret_key: Optional[bytes]):
+    """Pre-key an HMAC-SHA256 object; per-request .copy() skips the pad setup."""
+    if secret_key is None:
+        return None
+    return hmac.new(secret_key, digestmod=hashlib.sha256)
+
+
+# Secret key зависит только от BOT_TOKEN - считаем один раз при импорте
+_SECRET_KEY = _derive_secret_key(BOT_TOKEN)
+_HMAC_TEMPLATE = _make_hmac_template(_SECRET_KEY)
+
+
+# Ответ-заглушка для ENV=dev собирается один раз при импорте
+_DEV_RESULT = None
+if ENV == "dev":
+    _dev_username = os.getenv("DEV_USERNAME")
+    _DEV_RESULT = {
+        "username": _dev_username,
+        "user_data": {"username": _dev_username, "id": 12345},
+        "user_id": 12345
+    }
+
 
-def verify_telegram_init_data(init_data: str) -> dict:
+# Коды байтов "%" и "+": проверка `int in bytes` заметно быстрее, чем `b"%" in bytes`
+_PERCENT = ord("%")
+_PLUS = ord("+")
+
+
+def _unquote(part: bytes) -> bytes:
+    """Decode a URL-encoded component, skipping the call when there is nothing to decode."""
+    if _PERCENT in part or _PLUS in part:
+        return unquote_to_bytes(part.replace(b"+", b" "))
+    return part
+
+
+def _parse_init_data(init_data: bytes) -> List[Tuple[bytes, bytes]]:
+    """
+    Split UTF-8 encoded initData into decoded (key, value) byte pairs.
+
+    Equivalent to parse_qsl(init_data, keep_blank_values=True) for the rigid
+    key=value&key=value layout Telegram sends, in a single split/partition pass.
+    Values stay as UTF-8 bytes so the data check string can be signed without
+    re-encoding.
+
+    Args:
+        init_data: URL-encoded initData from Telegram WebApp, as bytes
+
+    Returns:
+        list: Decoded (key, value) pairs in their original order
+    """
+    pairs = []
+    for pair in init_data.split(b"&"):
+        if not pair:
+            continue
+        key, _, value = pair.partition(b"=")
+        pairs.append((_unquote(key), _unquote(value)))
+    return pairs
+
+
+def _verify_dev(init_data: str) -> dict:
+    """
+    Development stub (ENV=dev): skip verification and return the DEV_USERNAME user.
+
+    Args:
+        init_data: Ignored
+
+    Returns:
+        dict: {"username": str, "user_data": dict, "user_id": int}
+    """
+    # WARNING: This stub is for local development only!
+    logger.info("🔧 DEV mode: using username '%s'", _DEV_RESULT['username'])
+    # Копия, как и для результатов из кэша - вызывающий код может её менять
+    return dict(_DEV_RESULT)
+
+
+def _verify_prod(init_data: str) -> dict:
     """
     Verify the Telegram WebApp initData hash and return parsed data if valid.
-    In development mode (ENV=dev), always return a test username for local testing.
 
     Args:
         init_data: URL-encoded string from Telegram WebApp
@@ -27,99 +140,145 @@ def verify_telegram_init_data(init_data: str) -> dict:
     Raises:
         ValueError: If validation fails
     """
-    if ENV == "dev":
-        # WARNING: This stub is for local development only!
-        dev_username = os.getenv("DEV_USERNAME")
-        logger.info(f"🔧 DEV mode: using username '{dev_username}'")
-        return {
-            "username": dev_username,
-            "user_data": {"username": dev_username, "id": 12345},
-            "user_id": 12345
-        }
-
     # Проверяем что BOT_TOKEN установлен
-    if not BOT_TOKEN:
+    if _HMAC_TEMPLATE is None:
         logger.error("BOT_TOKEN is not set")
-        raise ValueError("Server configuration error")
+        raise ValueError(_ERR_CONFIG)
 
-    # Parse initData from URL-encoded string to dictionary
+    # Весь разбор и подпись идут в байтах - initData кодируется ровно один раз
     try:
-        parsed = dict(parse_qsl(init_data, keep_blank_values=True))
+        raw_init_data = init_data.encode()
+    except (AttributeError, UnicodeEncodeError) as e:
+        # Не строка или одиночный суррогат - такие данные не могли прийти от Telegram
+        logger.error("Failed to encode initData: %s", e)
+        raise ValueError(_ERR_FORMAT)
+
+    # Повторная отправка того же initData в рамках сессии - без HMAC
+    cache_key = hashlib.sha256(raw_init_data).digest()
+    with _verified_cache_lock:
+        cached = _verified_cache.get(cache_key)
+    if cached is not None:
+        result, expires_at = cached
+        if expires_at > time.time():
+            return dict(result)
+
+    # Parse initData from URL-encoded string to key/value pairs
+    try:
+        pairs = _parse_init_data(raw_init_data)
     except Exception as e:
-        logger.error(f"Failed to parse initData: {e}")
-        raise ValueError("Invalid initData format")
+        logger.error("Failed to parse initData: %s", e)
+        raise ValueError(_ERR_FORMAT)
 
-    hash_received = parsed.pop("hash", None)
-    if not hash_received:
+    # Один проход: отделяем hash и собираем пары для data check string
+    hash_received = None
+    auth_date = None
+    user_json = b"{}"
+    fields = []
+    for key, value in pairs:
+        if key == b"hash":
+            hash_received = value
+            continue
+        if key == b"auth_date":
+            auth_date = value
+        elif key == b"user":
+            user_json = value
+        fields.append((key, value))
+
+    # Без hash всё равно считаем HMAC и сравниваем с заглушкой: по времени ответа
+    # нельзя отличить "hash отсутствует" от "hash неверный"
+    hash_missing = not hash_received
+    if hash_missing:
         logger.error("Missing hash in initData")
-        raise ValueError("Missing hash in initData")
+        hash_received = _DUMMY_HASH
+
+    # Хеш не той формы (не 64 hex-символа) отклоняем до HMAC: форма хеша не секрет,
+    # а мусорный initData не должен стоить нам подписи
+    if len(hash_received) != HASH_HEX_LENGTH:
+        logger.error("Malformed hash in initData")
+        raise ValueError(_ERR_SIGNATURE)
+    try:
+        received_hash = binascii.unhexlify(hash_received)
+    except binascii.Error:
+        logger.error("Malformed hash in initData")
+        raise ValueError(_ERR_SIGNATURE)
 
     # Проверяем срок действия данных
-    auth_date = parsed.get("auth_date")
+    # Целые секунды из time_ns - без промежуточного float, один вызов на запрос
+    current_time = time.time_ns() // 1_000_000_000
+    expires_at = current_time + INIT_DATA_CACHE_TTL
     if auth_date:
         try:
             auth_timestamp = int(auth_date)
-            current_time = int(time.time())
             age = current_time - auth_timestamp
 
             if age > MAX_AUTH_AGE:
-                logger.warning(f"Auth data too old: {age} seconds")
-                raise ValueError("Authentication data expired")
+                logger.warning("Auth data too old: %s seconds", age)
+                raise ValueError(_ERR_EXPIRED)
 
-            logger.debug(f"Auth data age: {age} seconds")
+            logger.debug("Auth data age: %s seconds", age)
+            expires_at = min(expires_at, auth_timestamp + MAX_AUTH_AGE)
         except (ValueError, TypeError):
-            logger.error(f"Invalid auth_date format: {auth_date}")
-            raise ValueError("Invalid auth_date")
+            logger.error("Invalid auth_date format: %s", auth_date)
+            raise ValueError(_ERR_AUTH_DATE)
 
     # Build data check string in alphabetical order
-    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(parsed.items()))
+    # (порядок байтов UTF-8 совпадает с порядком кодовых точек - сортировка та же)
+    fields.sort()
+    data_check_bytes = b"\n".join([b"=".join(field) for field in fields])
 
-    # Генерируем secret key согласно документации Telegram
+    # Подписываем data check string копией заранее подготовленного HMAC:
+    # ключ и ipad/opad уже обработаны, остаётся только само сообщение
     try:
-        secret_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
-        calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+        mac = _HMAC_TEMPLATE.copy()
+        mac.update(data_check_bytes)
+        calculated_hash = mac.digest()
     except Exception as e:
-        logger.error(f"Failed to calculate hash: {e}")
-        raise ValueError("Hash calculation failed")
+        logger.error("Failed to calculate hash: %s", e)
+        raise ValueError(_ERR_HASH_CALC)
 
-    # Securely compare calculated hash and received hash
-    if not hmac.compare_digest(calculated_hash, hash_received):
-        logger.error("Hash validation failed")
+    # Securely compare calculated hash and received hash (raw bytes)
+    if not hmac.compare_digest(calculated_hash, received_hash) or hash_missing:
         # НЕ логируем сами хеши в продакшене для безопасности
-        if ENV == "dev":
-            logger.debug(f"Expected: {calculated_hash}, Got: {hash_received}")
-            logger.debug(f"Data check string: {data_check_string}")
-        raise ValueError("Invalid initData signature")
+        logger.error("Hash validation failed")
+        raise ValueError(_ERR_SIGNATURE)
 
     logger.info("Telegram signature validation successful")
 
     # Извлекаем и валидируем данные пользователя
     try:
-        user_json = parsed.get("user", "{}")
-        user_data = json.loads(user_json)
+        user_data = _json_loads(user_json)
 
         # Проверяем обязательные поля
         user_id = user_data.get("id")
         if not isinstance(user_id, int):
-            logger.error(f"Invalid user_id type: {type(user_id)}")
-            raise ValueError("Invalid user_id")
+            logger.error("Invalid user_id type: %s", type(user_id))
+            raise ValueError(_ERR_USER_ID)
 
         username = user_data.get("username", "").strip().lower()
         if not username:
             logger.error("Username missing in user data")
-            raise ValueError("Username required")
+            raise ValueError(_ERR_USERNAME)
 
-        logger.info(f"✅ User authenticated: {username} (ID: {user_id})")
+        logger.info("✅ User authenticated: %s (ID: %s)", username, user_id)
 
-        return {
+        result = {
             "username": username,
             "user_data": user_data,
             "user_id": user_id
         }
+        with _verified_cache_lock:
+            _verified_cache[cache_key] = (result, expires_at)
+
+        return dict(result)
 
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse user JSON: {e}")
-        raise ValueError("Invalid user data format")
+        logger.error("Failed to parse user JSON: %s", e)
+        raise ValueError(_ERR_USER_FORMAT)
     except Exception as e:
-        logger.error(f"User data validation failed: {e}")
-        raise ValueError("User data validation failed")
\ No newline at end of file
+        logger.error("User data validation failed: %s", e)
+        raise ValueError(_ERR_USER_DATA)
+
+
+# Вариант проверки выбирается один раз при импорте по ENV: в dev - заглушка,
+# в продакшене - полная проверка без ветвления на каждом запросе
+verify_telegram_init_data = _verify_dev if _DEV_RESULT is not None else _verify_prod